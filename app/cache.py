@@ -0,0 +1,318 @@
+"""In-process read-through cache for single-entity reads.
+
+Entries hold the encoded JSON body of an entity keyed by its id. Each cache is
+bounded by entry count and total bytes, evicts least recently used entries
+first and can expire entries after a TTL. Writers invalidate exact keys, or a
+tag such as the author of a post.
+
+Other worker processes write to the same SQLite file, so before serving from
+cache each worker checks ``PRAGMA data_version`` and replays the
+``cache_invalidations`` log that triggers fill on every update and delete.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Set
+
+from app.metrics import gauge
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+# Invalidation log rows kept for workers that have not caught up yet
+CACHE_INVALIDATION_RETENTION = int(os.getenv("CACHE_INVALIDATION_RETENTION", "10000"))
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+    tag: Optional[Hashable]
+
+
+class LRUCache:
+    """A thread-safe LRU cache of encoded response bodies.
+
+    Values are bytes, or any object when ``set`` is given its ``size``.
+    ``max_entries=0`` disables the cache. ``max_bytes=0`` and ``ttl=0`` mean
+    no byte limit and no expiry.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        ttl: float = CACHE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.tag is not None:
+            keys = self._tags[entry.tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry.tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or ``None`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def begin_read(self) -> int:
+        """Get a token to pass to ``set`` for a value about to be loaded.
+
+        If any invalidation happens while the value is being read from the
+        database, the matching ``set`` is skipped so stale data is not cached.
+        """
+        return self._invalidations
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tag: Optional[Hashable] = None,
+        token: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        """Store a value, evicting least recently used entries to make room."""
+        if not self.max_entries:
+            return
+        if size is None:
+            size = len(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+            self._entries[key] = _Entry(value, size, expires_at, tag)
+            self._bytes += size
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drop entries by key."""
+        with self._lock:
+            self._invalidations += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Drop every entry stored with ``tag``."""
+        with self._lock:
+            self._invalidations += 1
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit, miss and eviction counters plus current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "maxEntries": self.max_entries,
+            "maxBytes": self.max_bytes,
+            "ttlSeconds": self.ttl,
+        }
+
+
+users_cache = LRUCache("users")
+posts_cache = LRUCache("posts")
+todos_cache = LRUCache("todos")
+
+CACHES: List[LRUCache] = [users_cache, posts_cache, todos_cache]
+
+# Caches whose statistics appear at /metrics; other modules add their own
+REPORTED_CACHES: List[LRUCache] = list(CACHES)
+
+for _field, _documentation in (
+    ("hits", "Lookups served from the cache, by cache."),
+    ("misses", "Lookups the cache could not serve, by cache."),
+    ("evictions", "Entries evicted to stay within the limits, by cache."),
+    ("entries", "Entries held, by cache."),
+    ("bytes", "Bytes held, by cache."),
+):
+    gauge(
+        f"cache_{_field}",
+        _documentation,
+        lambda field=_field: {
+            (cache.name,): cache.stats()[field] for cache in REPORTED_CACHES
+        },
+        ("cache",),
+    )
+
+
+class CacheCoherence:
+    """Drops cache entries that other processes changed in the database.
+
+    A dedicated connection polls ``PRAGMA data_version``, which only changes
+    when another connection commits. Only then is the invalidation log read
+    from the last sequence number this process has seen. The connection never
+    waits for locks: if the check cannot run, callers bypass the cache.
+    """
+
+    def __init__(self, caches: Dict[str, LRUCache]):
+        self.caches = caches
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._last_seq: Optional[int] = None
+        self._pruned_seq = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        from app.database import get_pool
+
+        conn = sqlite3.connect(get_pool().db_path, timeout=0, check_same_thread=False)
+        conn.isolation_level = None
+        return conn
+
+    def _invalidate(self, entity: str, entity_id: Hashable) -> None:
+        cache = self.caches.get(entity)
+        if cache is not None:
+            cache.invalidate(entity_id)
+        if entity == "users":
+            # Cached posts embed their author
+            posts_cache.invalidate_tag(entity_id)
+
+    def _clear(self) -> None:
+        for cache in self.caches.values():
+            cache.clear()
+
+    def check(self) -> bool:
+        """Apply invalidations committed elsewhere; False if caches are unsafe."""
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                conn = self._conn
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version == self._data_version:
+                    return True
+
+                if self._last_seq is None:
+                    # Nothing seen yet: start from the end of the log
+                    self._last_seq = conn.execute(
+                        "SELECT coalesce(max(seq), 0) FROM cache_invalidations"
+                    ).fetchone()[0]
+                    self._clear()
+                else:
+                    rows = conn.execute(
+                        "SELECT seq, entity, entityId FROM cache_invalidations "
+                        "WHERE seq > ? ORDER BY seq",
+                        (self._last_seq,),
+                    ).fetchall()
+                    if rows and rows[0][0] > self._last_seq + 1:
+                        # Entries we never saw were pruned
+                        self._clear()
+                    for seq, entity, entity_id in rows:
+                        self._invalidate(entity, entity_id)
+                        self._last_seq = seq
+
+                self._data_version = version
+                self._prune(conn)
+                return True
+            except sqlite3.Error as exc:
+                logger.debug("Cache coherence check skipped: %s", exc)
+                return False
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Trim the invalidation log once it is well past the retention."""
+        horizon = self._last_seq - CACHE_INVALIDATION_RETENTION
+        if horizon - self._pruned_seq < CACHE_INVALIDATION_RETENTION:
+            return
+        try:
+            conn.execute("DELETE FROM cache_invalidations WHERE seq <= ?", (horizon,))
+        except sqlite3.OperationalError:
+            return  # Busy: try again after the next change
+        self._pruned_seq = horizon
+
+    def close(self) -> None:
+        """Close the polling connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._data_version = None
+            self._last_seq = None
+
+
+coherence = CacheCoherence(
+    {"users": users_cache, "posts": posts_cache, "todos": todos_cache}
+)
+
+
+def sync_caches() -> bool:
+    """Bring caches up to date with other processes before a cached read."""
+    return coherence.check()
+
+
+def read_through(
+    cache: LRUCache, key: Hashable, load: Callable[..., Any], *args: Any
+) -> Any:
+    """Get an entity from ``cache``, loading and caching it on a miss.
+
+    The coherence check and the load both block on the database, so call this
+    through ``run_blocking`` rather than on the event loop. ``load(db, *args)``
+    gets a pooled connection only on a miss and returns the entity and the tag
+    to store it under.
+    """
+    from app.database import get_db
+
+    entity = cache.get(key) if sync_caches() else None
+    if entity is None:
+        token = cache.begin_read()
+        with get_db() as db:
+            entity, tag = load(db, *args)
+        cache.set(key, entity, tag=tag, token=token, size=len(entity.body))
+    return entity
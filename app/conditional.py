@@ -0,0 +1,178 @@
+"""Conditional GET support: ETag, Last-Modified and 304 responses.
+
+Collections are validated by the per-table change counters in
+``table_versions``, which triggers bump on every insert, update and delete,
+plus a digest of the path and query, since parameters such as ``fields``,
+``include``, ``limit`` and ``after`` change the body for the same rows.
+Checking them is a primary-key lookup, so an unchanged collection is answered
+with ``304 Not Modified`` without running the listing query. Single entities
+carry an ETag computed once from their encoded body and the row's
+``updatedAt`` as Last-Modified.
+
+Last-Modified has one-second resolution, so a write later in the same second
+keeps the same date. A date is therefore only sent, and If-Modified-Since only
+honored, once its second is over (RFC 9110, section 8.8.2.2).
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import urlencode
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence
+
+from fastapi import Request, Response, status
+from pydantic_core import to_json
+
+from app.metrics import encode_duration, timed
+from app.migrations import LATEST_VERSION
+from app.serialization import json_response
+
+
+class Validators(NamedTuple):
+    """Cache validators for one representation."""
+
+    etag: str
+    last_modified: Optional[str] = None
+
+    def headers(self) -> Dict[str, str]:
+        """Response headers carrying the validators."""
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified and _settled(self.last_modified):
+            headers["Last-Modified"] = self.last_modified
+        return headers
+
+
+class Entity(NamedTuple):
+    """An encoded entity body with its validators, as stored in the caches."""
+
+    body: bytes
+    validators: Validators
+
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """Convert a SQLite ``CURRENT_TIMESTAMP`` value to an HTTP date."""
+    if not timestamp:
+        return None
+    moment = datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc)
+    return format_datetime(moment, usegmt=True)
+
+
+def _settled(last_modified: str) -> bool:
+    """Whether no later write can still get the date ``last_modified``."""
+    return parsedate_to_datetime(last_modified).timestamp() + 1 <= time.time()
+
+
+def make_entity(payload: Any, updated_at: Optional[str]) -> Entity:
+    """Encode an entity and derive its validators."""
+    with timed("encode", encode_duration):
+        body = to_json(payload)
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return Entity(body, Validators(f'W/"{digest}"', http_date(updated_at)))
+
+
+def query_variant(request: Request) -> str:
+    """Digest the path and normalized query string of a collection request."""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=6).hexdigest()
+
+
+def table_validators(db, tables: Sequence[str], variant: str = "") -> Validators:
+    """Derive collection validators from the change counters of ``tables``.
+
+    ``variant`` tells apart representations of the same rows, such as pages
+    or field selections.
+    """
+    rows = {
+        row[0]: row[1:]
+        for row in db.execute(
+            "SELECT name, version, updatedAt FROM table_versions "
+            f"WHERE name IN ({', '.join(['?'] * len(tables))})",
+            tables,
+        )
+    }
+    versions = ".".join(str(rows.get(table, (0,))[0]) for table in tables)
+    updated = max((row[1] for row in rows.values() if row[1]), default=None)
+    # Prefix the schema version so migrations that change the shape also
+    # change the ETag
+    etag = f"{LATEST_VERSION}:{versions}"
+    if variant:
+        etag += f":{variant}"
+    return Validators(f'W/"{etag}"', http_date(updated))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    validators: Validators,
+) -> bool:
+    """Evaluate conditional request headers against current validators."""
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, validators.etag)
+    if (
+        if_modified_since
+        and validators.last_modified
+        and _settled(validators.last_modified)
+    ):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return parsedate_to_datetime(validators.last_modified) <= since
+    return False
+
+
+def conditional_headers(request: Request) -> Dict[str, Optional[str]]:
+    """Pick the conditional headers out of a request."""
+    return {
+        "if_none_match": request.headers.get("if-none-match"),
+        "if_modified_since": request.headers.get("if-modified-since"),
+    }
+
+
+def not_modified_response(validators: Validators) -> Response:
+    """Build a ``304 Not Modified`` response."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers()
+    )
+
+
+def entity_response(request: Request, entity: Entity) -> Response:
+    """Answer a single-entity read, with 304 if the client's copy is current."""
+    validators = entity.validators
+    if is_not_modified(validators=validators, **conditional_headers(request)):
+        return not_modified_response(validators)
+    return json_response(entity.body, headers=validators.headers())
+
+
+def load_if_modified(
+    db,
+    tables: Sequence[str],
+    conditions: Dict[str, Optional[str]],
+    loader: Callable[..., Any],
+    *args: Any,
+    variant: str = "",
+):
+    """Run ``loader(db, *args)`` unless the client's copy is still current.
+
+    Returns ``(result, validators)`` where ``result`` is ``None`` when the
+    collection has not changed since the client's validators. Pass the
+    request's :func:`query_variant` as ``variant``.
+    """
+    validators = table_validators(db, tables, variant)
+    if is_not_modified(validators=validators, **conditions):
+        return None, validators
+    return loader(db, *args), validators
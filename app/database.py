@@ -1,78 +1,677 @@
 """Database connection and initialization."""
 
+import asyncio
+import contextvars
+import functools
+import logging
 import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from app.metrics import (
+    METRICS_ENABLED,
+    db_connect_duration,
+    db_fetch_seconds,
+    db_pool_wait,
+    db_rows,
+    db_statement_duration,
+    gauge,
+    normalize_sql,
+    sql_label,
+    record_phase,
+)
+
+from app.migrations import LATEST_VERSION, get_schema_version, migrate
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5.0"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+# Streaming exports running at once, each on its own connection outside the pool
+DB_EXPORT_CONCURRENCY = int(os.getenv("DB_EXPORT_CONCURRENCY", "2"))
+# Connections opened at startup so the first requests don't pay for them
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+
+# Maximum number of queries running at once on the database executor
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", str(DB_POOL_SIZE)))
+
+# Named sets of PRAGMAs applied to every connection
+PRAGMA_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "busy_timeout": 5000,
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,  # 256 MiB
+        "cache_size": -65536,  # 64 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+DB_PROFILE = os.getenv(
+    "DB_PROFILE",
+    "production" if os.getenv("ENVIRONMENT") == "production" else "default",
+)
+
+# Statements slower than this are logged with their query plan; 0 disables
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+# Distinct slow statements kept for GET /admin/slow-queries
+DB_SLOW_QUERY_TOP_N = int(os.getenv("DB_SLOW_QUERY_TOP_N", "50"))
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
 
 
 def get_db_path() -> Path:
     """Get the path to the database file."""
     # Allow custom database path via environment variable
     # Default to local data.db for development, /app/data/data.db for production
-    default_path = "/app/data/data.db" if os.getenv("ENVIRONMENT") == "production" else "data.db"
+    default_path = (
+        "/app/data/data.db" if os.getenv("ENVIRONMENT") == "production" else "data.db"
+    )
     db_path = os.getenv("DATABASE_PATH", default_path)
     db_file = Path(db_path)
-    
+
     # Ensure directory exists
     db_file.parent.mkdir(parents=True, exist_ok=True)
-    
+
     return db_file
 
 
+def get_pragmas(profile: str = DB_PROFILE) -> Dict[str, Any]:
+    """Get the PRAGMAs for a profile, with ``DB_PRAGMA_<NAME>`` overrides."""
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE {profile!r}, expected one of {sorted(PRAGMA_PROFILES)}"
+        )
+    pragmas = dict(PRAGMA_PROFILES[profile])
+    for name in PRAGMA_PROFILES["production"]:
+        override = os.getenv(f"DB_PRAGMA_{name.upper()}")
+        if override:
+            pragmas[name] = override
+    return pragmas
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any]) -> None:
+    """Apply PRAGMA settings to a connection."""
+    for name, value in pragmas.items():
+        if not name.isidentifier() or not str(value).replace("-", "").isalnum():
+            raise ValueError(f"Invalid PRAGMA {name}={value!r}")
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def read_pragmas(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Read back the tuning PRAGMAs in effect on a connection."""
+    return {
+        name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in PRAGMA_PROFILES["production"]
+    }
+
+
+def redact_params(params: Any) -> Any:
+    """Describe query parameters by type and size, never by value."""
+    if isinstance(params, dict):
+        return {name: redact_params(value) for name, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [redact_params(value) for value in params]
+    if isinstance(params, (str, bytes)):
+        return f"<{type(params).__name__}:{len(params)}>"
+    if params is None:
+        return None
+    return f"<{type(params).__name__}>"
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[str]:
+    """Get the ``EXPLAIN QUERY PLAN`` steps of a statement, or ``[]``."""
+    try:
+        cursor = conn.cursor(sqlite3.Cursor)
+        return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    except sqlite3.Error:
+        return []  # Not explainable, e.g. BEGIN or PRAGMA
+
+
+class SlowQueryLog:
+    """The slowest statements seen by this process, by full normalized SQL.
+
+    Keeps at most ``size`` statements; when full, a new one replaces the
+    statement with the lowest maximum duration if it is slower.
+    """
+
+    def __init__(self, size: int = DB_SLOW_QUERY_TOP_N):
+        self.size = size
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def wants_plan(self, statement: str) -> bool:
+        """Whether no plan has been captured for ``statement`` yet."""
+        entry = self._entries.get(statement)
+        return entry is None or not entry["plan"]
+
+    def record(
+        self,
+        statement: str,
+        seconds: float,
+        params: Any,
+        plan: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Count one slow execution of ``statement``."""
+        with self._lock:
+            entry = self._entries.get(statement)
+            if entry is None:
+                if len(self._entries) >= self.size:
+                    fastest = min(
+                        self._entries, key=lambda s: self._entries[s]["maxMs"]
+                    )
+                    if self._entries[fastest]["maxMs"] >= seconds * 1000:
+                        return
+                    del self._entries[fastest]
+                entry = self._entries[statement] = {
+                    "statement": statement,
+                    "count": 0,
+                    "totalMs": 0.0,
+                    "maxMs": 0.0,
+                    "plan": [],
+                }
+            ms = seconds * 1000
+            entry["count"] += 1
+            entry["totalMs"] += ms
+            entry["maxMs"] = max(entry["maxMs"], ms)
+            entry["lastMs"] = ms
+            entry["lastSeen"] = time.time()
+            entry["lastParams"] = params
+            if plan:
+                entry["plan"] = list(plan)
+
+    def top(self) -> List[Dict[str, Any]]:
+        """Recorded statements, slowest first."""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["maxMs"], reverse=True)
+
+    def clear(self) -> None:
+        """Forget every recorded statement."""
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = SlowQueryLog()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that records statement timings and fetched row counts.
+
+    Statements whose execution plus fetching passes ``DB_SLOW_QUERY_MS`` are
+    logged once with redacted parameters and their query plan. Metrics are
+    labelled with the statement cut to ``METRICS_SQL_LABEL_LENGTH``; the log
+    keeps it whole, so statements that only differ late stay apart.
+    """
+
+    # Whether fetch time counts towards the slow-query threshold
+    time_fetches = True
+    _statement = ""
+    _label = ""
+    _sql = ""
+    _params: Any = ()
+    _elapsed = 0.0
+    _reported = False
+
+    def _executed(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        db_statement_duration.observe(elapsed, self._label)
+        record_phase("db", elapsed)
+        self._elapsed = elapsed
+        self._reported = False
+        self._check_slow()
+
+    def _fetched(self, start: float, rows: int) -> None:
+        elapsed = time.perf_counter() - start
+        db_fetch_seconds.inc(self._label, amount=elapsed)
+        db_rows.inc(self._label, amount=rows)
+        record_phase("db", elapsed)
+        if self.time_fetches:
+            self._elapsed += elapsed
+            self._check_slow()
+
+    def _check_slow(self) -> None:
+        if (
+            self._reported
+            or not DB_SLOW_QUERY_MS
+            or self._elapsed * 1000 < DB_SLOW_QUERY_MS
+        ):
+            return
+        self._reported = True
+        params = redact_params(self._params)
+        plan = None
+        if slow_queries.wants_plan(self._statement):
+            plan = explain(self.connection, self._sql, self._params)
+        slow_queries.record(self._statement, self._elapsed, params, plan)
+        logger.warning(
+            "Slow query (%.1f ms): %s params=%s plan=%s",
+            self._elapsed * 1000,
+            self._statement,
+            params,
+            plan,
+        )
+
+    def execute(self, sql, parameters=()):
+        self._statement = normalize_sql(sql)
+        self._label = sql_label(self._statement)
+        self._sql, self._params = sql, parameters
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._executed(start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._statement = normalize_sql(sql)
+        self._label = sql_label(self._statement)
+        # Too many rows to log or to explain with
+        self._sql, self._params = sql, ()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._executed(start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+
+class StreamingCursor(InstrumentedCursor):
+    """An instrumented cursor whose rows are read at the client's pace.
+
+    Exports fetch for as long as the download lasts, so only ``execute``
+    counts towards the slow-query threshold.
+    """
+
+    time_fetches = False
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors, including ``execute`` shortcuts, are instrumented."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ExportLimitReached(PoolTimeout):
+    """Raised when every streaming export slot is in use."""
+
+
+class ConnectionPool:
+    """A bounded pool of reusable SQLite connections.
+
+    Connections are opened lazily up to ``max_size`` and handed to one thread
+    at a time. Idle connections are reused most-recently-released first so
+    their page cache and prepared statement cache stay warm.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        cached_statements: int = DB_STATEMENT_CACHE_SIZE,
+        pragmas: Optional[Dict[str, Any]] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.db_path = Path(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.pragmas = get_pragmas() if pragmas is None else pragmas
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=max_size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        """Number of connections currently opened by the pool."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """Number of connections waiting in the pool."""
+        return self._idle.qsize()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection configured for pooled use."""
+        start = time.perf_counter()
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=InstrumentedConnection
+            if METRICS_ENABLED or DB_SLOW_QUERY_MS
+            else sqlite3.Connection,
+        )
+        conn.row_factory = sqlite3.Row
+        try:
+            apply_pragmas(conn, self.pragmas)
+        except Exception:
+            conn.close()
+            raise
+        db_connect_duration.observe(time.perf_counter() - start)
+        return conn
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection configured like the pooled ones, outside the pool.
+
+        The caller owns and closes it; it does not count towards ``max_size``.
+        """
+        return self._connect()
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take a connection from the pool, opening one if below capacity."""
+        start = time.perf_counter()
+        conn = self._acquire()
+        elapsed = time.perf_counter() - start
+        db_pool_wait.observe(elapsed)
+        record_phase("pool_wait", elapsed)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._size < self.max_size
+            if can_open:
+                self._size += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(
+                f"No database connection available after {self.timeout}s"
+            ) from None
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Close a connection and free its slot."""
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, rolling back unfinished work."""
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        # Checked again under the lock so close() cannot miss this connection
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._idle.put_nowait(conn)
+        if closed:
+            self._discard(conn)
+
+    def warm(self, count: int) -> int:
+        """Open up to ``count`` connections ahead of use and return how many.
+
+        Each connection reads the schema once, which SQLite otherwise does on
+        the first statement a connection runs.
+        """
+        conns = []
+        try:
+            while len(conns) < min(count, self.max_size):
+                conn = self._acquire()
+                conns.append(conn)
+                conn.execute("SELECT count(*) FROM sqlite_schema").fetchone()
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_db_path())
+    return _pool
+
+
+def set_pool(pool: Optional[ConnectionPool]) -> Optional[ConnectionPool]:
+    """Replace the process-wide connection pool and return the previous one."""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+    return previous
+
+
+def close_pool() -> None:
+    """Close the process-wide connection pool."""
+    previous = set_pool(None)
+    if previous is not None:
+        previous.close()
+
+
 @contextmanager
 def get_db():
     """Get a database connection."""
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    try:
+    with get_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def _pool_connections() -> Dict[tuple, float]:
+    """Open and idle connection counts of the current pool."""
+    pool = _pool
+    if pool is None:
+        return {}
+    return {("open",): pool.size, ("idle",): pool.idle}
+
+
+gauge(
+    "db_pool_connections",
+    "Connections held by the pool, by state.",
+    _pool_connections,
+    ("state",),
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the thread pool that runs blocking database work."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="db"
+                )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Wait for queued database work and stop the executor threads."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+_export_slots = threading.BoundedSemaphore(DB_EXPORT_CONCURRENCY)
+
+
+def acquire_export_slot() -> Callable[[], None]:
+    """Reserve one of ``DB_EXPORT_CONCURRENCY`` export slots without waiting.
+
+    Returns a function that frees the slot; calling it again does nothing.
+    Raises :class:`ExportLimitReached` when all slots are taken.
+    """
+    slots = _export_slots
+    if not slots.acquire(blocking=False):
+        raise ExportLimitReached("Too many exports running, retry later")
+    lock = threading.Lock()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        with lock:
+            if released:
+                return
+            released = True
+        slots.release()
+
+    return release
+
+
+def _call_with_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call ``fn`` with a pooled connection as its first argument."""
+    with get_db() as db:
+        return fn(db, *args, **kwargs)
+
+
+def submit_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Queue ``fn(db, *args, **kwargs)`` on the database executor."""
+    ctx = contextvars.copy_context()
+    return get_executor().submit(ctx.run, _call_with_db, fn, *args, **kwargs)
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ``fn(*args, **kwargs)`` on the database executor.
+
+    For blocking work that takes a pooled connection only when it needs one.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ``fn(db, *args, **kwargs)`` on the database executor.
+
+    The event loop stays free while the query runs. At most
+    ``DB_MAX_CONCURRENCY`` calls execute at once; the rest queue up without
+    blocking other requests.
+    """
+    return await run_blocking(_call_with_db, fn, *args, **kwargs)
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive lock on ``path`` shared by all processes on the host."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 def init_db():
-    """Initialize the database with required tables."""
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE,
-            userId TEXT NOT NULL UNIQUE
-        )
-    """)
-
-    # Create posts table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            body TEXT NOT NULL,
-            userId TEXT NOT NULL,
-            createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (userId) REFERENCES users(userId)
-        )
-    """)
-
-    # Create todos table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS todos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            task TEXT NOT NULL,
-            completed BOOLEAN NOT NULL DEFAULT FALSE
-        )
-    """)
+    """Bring the database schema up to the latest migration.
 
-    conn.commit()
-    conn.close()
+    When several workers start at once, the first to take the lock file next
+    to the database runs the migrations and the others find them applied,
+    instead of all of them queueing on SQLite's write lock.
+    """
+    pool = get_pool()
+    with pool.connection() as conn:
+        if get_schema_version(conn) == LATEST_VERSION:
+            return
+    with file_lock(pool.db_path.with_name(pool.db_path.name + ".lock")):
+        with pool.connection() as conn:
+            migrate(conn)
 
 
 if __name__ == "__main__":
     init_db()
-    print("Database initialized successfully!")
+    with get_db() as db:
+        print(f"Database initialized at schema version {get_schema_version(db)}")
+        print(f"Profile {DB_PROFILE}: {read_pragmas(db)}")
@@ -0,0 +1,88 @@
+"""Sparse fieldsets for list endpoints.
+
+A ``fields=`` query parameter names the top-level response fields a client
+wants. Each field maps to the SQL columns it is built from, so unrequested
+columns are never read or decoded. The columns of the sort key are always
+selected first so pages can still be cut with a cursor.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+
+from app.serialization import Row
+
+
+class Column(NamedTuple):
+    """A response field and the SQL expressions it is decoded from."""
+
+    expressions: Tuple[str, ...]
+    decode: Callable[[Row], Any]
+
+
+def single(expression: str, decode: Callable[[Any], Any] = lambda value: value):
+    """A field read from one column."""
+    return Column((expression,), lambda values: decode(values[0]))
+
+
+def fields_query(names: Sequence[str]):
+    """A ``fields`` query parameter listing the selectable fields."""
+    return Query(
+        None,
+        description="Comma-separated fields to return: " + ", ".join(names),
+    )
+
+
+class FieldSet:
+    """The selectable fields of one listing and their column list."""
+
+    def __init__(
+        self,
+        fields: Dict[str, Column],
+        key: Sequence[str],
+        defaults: Optional[Sequence[str]] = None,
+    ):
+        self.fields = fields
+        self.key = tuple(key)
+        self.defaults = list(fields if defaults is None else defaults)
+
+    def parse(self, fields: Optional[str]) -> List[str]:
+        """Validate a ``fields`` parameter; ``None`` selects the defaults."""
+        if fields is None:
+            return list(self.defaults)
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields {unknown}, expected some of {list(self.fields)}",
+            )
+        if not names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="No fields selected"
+            )
+        # Keep the declared order and drop duplicates
+        return [name for name in self.fields if name in names]
+
+    def select(
+        self, names: Sequence[str]
+    ) -> Tuple[str, Callable[[Row], Dict[str, Any]]]:
+        """Build the column list for ``names`` and the matching row mapper.
+
+        The sort key columns come first, so ``row[:len(key)]`` is the cursor
+        key of a row.
+        """
+        expressions = list(self.key)
+        decoders = []
+        for name in names:
+            column = self.fields[name]
+            start = len(expressions)
+            expressions.extend(column.expressions)
+            decoders.append((name, start, len(expressions), column.decode))
+
+        def to_dict(row: Row) -> Dict[str, Any]:
+            return {
+                name: decode(row[start:end]) for name, start, end, decode in decoders
+            }
+
+        return ", ".join(expressions), to_dict
@@ -0,0 +1,172 @@
+"""Readiness probe for the database behind the API.
+
+``/readyz`` reports whether this worker should receive traffic. The probe
+opens its own connection, so it neither waits for nor takes a pooled one,
+and checks that the database:
+
+- can be opened and its write lock taken within ``HEALTH_LOCK_TIMEOUT_MS``
+- is at the schema version this code expects
+- has a WAL that checkpoints keep up with
+- sits on a volume with at least ``HEALTH_MIN_FREE_MB`` free
+
+The WAL and disk limits fail well before writes do, so traffic drains first.
+A result is reused for ``HEALTH_CACHE_SECONDS`` and only one probe runs at a
+time, however often the orchestrator asks.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.database import get_pool
+from app.migrations import LATEST_VERSION, get_schema_version
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+HEALTH_LOCK_TIMEOUT_MS = float(os.getenv("HEALTH_LOCK_TIMEOUT_MS", "1000"))
+# WAL frames not yet copied into the database after a passive checkpoint
+HEALTH_MAX_WAL_FRAMES = int(os.getenv("HEALTH_MAX_WAL_FRAMES", "10000"))
+HEALTH_MIN_FREE_MB = float(os.getenv("HEALTH_MIN_FREE_MB", "100"))
+
+Check = Dict[str, Any]
+
+
+def check_database(conn: sqlite3.Connection, path: Path) -> Check:
+    """Check that the database is writable and its write lock is free."""
+    if not os.access(path, os.W_OK):
+        return {"status": "fail", "error": "Database file is not writable"}
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("ROLLBACK")
+    return {
+        "status": "ok",
+        "latencyMs": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def check_schema(conn: sqlite3.Connection) -> Check:
+    """Check that migrations are at the version this code expects."""
+    version = get_schema_version(conn)
+    return {
+        "status": "ok" if version == LATEST_VERSION else "fail",
+        "version": version,
+        "expected": LATEST_VERSION,
+    }
+
+
+def check_wal(conn: sqlite3.Connection) -> Check:
+    """Checkpoint what readers allow and check how much of the WAL is left."""
+    _, frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if frames < 0:
+        return {"status": "ok", "journal": "rollback"}
+    lag = frames - checkpointed
+    return {
+        "status": "ok" if lag <= HEALTH_MAX_WAL_FRAMES else "fail",
+        "pendingFrames": lag,
+        "maxFrames": HEALTH_MAX_WAL_FRAMES,
+    }
+
+
+def check_disk(path: Path) -> Check:
+    """Check the free space on the database volume."""
+    free = shutil.disk_usage(path.parent).free
+    minimum = int(HEALTH_MIN_FREE_MB * 1024 * 1024)
+    return {
+        "status": "ok" if free >= minimum else "fail",
+        "freeBytes": free,
+        "minFreeBytes": minimum,
+    }
+
+
+def probe(path: Path) -> Dict[str, Any]:
+    """Run every check against the database at ``path``."""
+    checks: Dict[str, Check] = {}
+    conn = None
+    try:
+        # mode=rw fails on a missing file instead of creating an empty one
+        conn = sqlite3.connect(
+            f"file:{path}?mode=rw",
+            uri=True,
+            timeout=HEALTH_LOCK_TIMEOUT_MS / 1000,
+            isolation_level=None,
+        )
+        for name, check in (
+            ("database", lambda: check_database(conn, path)),
+            ("schema", lambda: check_schema(conn)),
+            ("wal", lambda: check_wal(conn)),
+        ):
+            try:
+                checks[name] = check()
+            except sqlite3.Error as exc:
+                checks[name] = {"status": "fail", "error": str(exc)}
+    except sqlite3.Error as exc:
+        checks["database"] = {"status": "fail", "error": str(exc)}
+    finally:
+        if conn is not None:
+            conn.close()
+
+    try:
+        checks["disk"] = check_disk(path)
+    except OSError as exc:
+        checks["disk"] = {"status": "fail", "error": str(exc)}
+
+    healthy = all(check["status"] == "ok" for check in checks.values())
+    return {
+        "status": "ok" if healthy else "degraded",
+        "checkedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "checks": checks,
+    }
+
+
+class ReadinessProbe:
+    """Caches probe results and runs at most one probe at a time."""
+
+    def __init__(
+        self,
+        path: Callable[[], Path],
+        ttl: float = HEALTH_CACHE_SECONDS,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result: Optional[Dict[str, Any]] = None
+        self._expires = 0.0
+
+    def cached(self) -> Optional[Dict[str, Any]]:
+        """The last result, if it is still fresh."""
+        if time.monotonic() < self._expires:
+            return self._result
+        return None
+
+    def check(self) -> Dict[str, Any]:
+        """Return a fresh enough result, probing if there is none.
+
+        Callers arriving while a probe runs get the previous result rather
+        than starting another one.
+        """
+        result = self.cached()
+        if result is not None:
+            return result
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            result = self.cached()
+            if result is None:
+                result = self._result = probe(self.path())
+                self._expires = time.monotonic() + self.ttl
+            return result
+        finally:
+            self._lock.release()
+
+    def reset(self) -> None:
+        """Forget the cached result."""
+        with self._lock:
+            self._result = None
+            self._expires = 0.0
+
+
+readiness = ReadinessProbe(lambda: get_pool().db_path)
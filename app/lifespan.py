@@ -0,0 +1,57 @@
+"""Application startup and shutdown.
+
+Nothing touches the database at import time. On startup the schema is
+migrated once across workers, the connection pool is opened ahead of the
+first request and the cache coherence check is primed. On shutdown queued
+writes are flushed and every connection is closed.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.cache import coherence
+from app.database import (
+    DB_POOL_WARM,
+    close_pool,
+    get_pool,
+    init_db,
+    shutdown_executor,
+)
+from app.writer import close_writer
+
+logger = logging.getLogger(__name__)
+
+
+def startup() -> None:
+    """Migrate the schema and warm the pool and caches."""
+    start = time.perf_counter()
+    init_db()
+    warmed = get_pool().warm(DB_POOL_WARM)
+    coherence.check()
+    logger.info(
+        "Database ready in %.1f ms with %d connections",
+        (time.perf_counter() - start) * 1000,
+        warmed,
+    )
+
+
+def shutdown() -> None:
+    """Finish pending database work and close every connection."""
+    close_writer()
+    shutdown_executor()
+    coherence.close()
+    close_pool()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run :func:`startup` before serving and :func:`shutdown` after."""
+    await asyncio.to_thread(startup)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(shutdown)
@@ -1,15 +1,30 @@
 """Main application module."""
 
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.routers import posts, todos, users
-from app.database import init_db
+from app.database import PoolTimeout
+
+from app.metrics import METRICS_ENABLED
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.timing import TimingMiddleware
+from app.pagination import NEXT_CURSOR_HEADER
+from app.lifespan import lifespan
+from app.routers import admin, health, metrics, posts, todos, users
 
 # Environment-based configuration
 ENV = os.getenv("ENVIRONMENT", "development")
 DEBUG = ENV == "development"
+# Operational endpoints under /admin; on by default only in development
+ADMIN_ENABLED = os.getenv("ADMIN_ENABLED", str(DEBUG)).lower() in ("1", "true", "yes")
+# Per-request timing breakdown in responses; it reveals backend timings to
+# clients, so by default it is only sent in development
+SERVER_TIMING = os.getenv("SERVER_TIMING", str(DEBUG)).lower() in ("1", "true", "yes")
+# Response headers cross-origin browser clients need to read
+CORS_EXPOSE_HEADERS = [NEXT_CURSOR_HEADER, "ETag", "Retry-After"]
 
 # Initialize FastAPI with metadata
 app = FastAPI(
@@ -18,9 +33,17 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if DEBUG else None,  # Disable docs in production
     redoc_url="/redoc" if DEBUG else None,
+    lifespan=lifespan,
 )
 
-# Configure CORS based on environment
+# Compress large responses for clients that accept it
+app.add_middleware(CompressionMiddleware)
+
+# Shed load and rate limit clients before any work is done; off by default
+app.add_middleware(AdmissionMiddleware)
+
+# Configure CORS based on environment; added after admission control so
+# browsers can read its 429 and 503 responses too
 if ENV == "production":
     # In production, configure specific origins
     allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
@@ -30,6 +53,7 @@ if ENV == "production":
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE"],
         allow_headers=["*"],
+        expose_headers=CORS_EXPOSE_HEADERS,
     )
 else:
     # Development: allow all origins
@@ -39,15 +63,32 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=CORS_EXPOSE_HEADERS,
     )
 
+# Time every request, including compression and shed requests;
+# added last so it runs first
+if METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware, server_timing=SERVER_TIMING)
+
 # Include routers
 app.include_router(users.router)
 app.include_router(posts.router)
 app.include_router(todos.router)
+if ADMIN_ENABLED:
+    app.include_router(admin.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+
 
-# Initialize database on startup
-init_db()
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Answer 503 when every database connection stays busy, so clients retry."""
+    return JSONResponse(
+        {"detail": "Database is busy, retry later"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/")
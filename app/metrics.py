@@ -0,0 +1,361 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and histograms live in a module-level registry and are
+served by ``GET /metrics``. No client library or collector is needed, and
+each worker process reports its own numbers, like ``prometheus_client``
+does without multiprocess mode.
+
+Request handlers also get a per-request breakdown of where time went,
+collected in :data:`request_timings` and sent back as a ``Server-Timing``
+header by the timing middleware.
+"""
+
+import bisect
+import contextvars
+import functools
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+# Longest normalized SQL kept as a label value
+METRICS_SQL_LABEL_LENGTH = int(os.getenv("METRICS_SQL_LABEL_LENGTH", "200"))
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render ``{name="value",...}``, or nothing without labels."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        """The HELP and TYPE lines."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self) -> List[str]:
+        """The sample lines."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """The metric family in exposition format."""
+        return self.header() + self.samples()
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add ``amount`` to the counter for ``labels``."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Current value for ``labels``."""
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A value read from a callback when metrics are rendered."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        read: Callable[[], Dict[LabelValues, float]],
+        labels: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labels)
+        self.read = read
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.read().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (+Inf last), sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for ``labels``."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        """Number of observations for ``labels``."""
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (labels, (list(counts), total[0]))
+                for labels, (counts, total) in self._series.items()
+            )
+        lines = []
+        names = (*self.labels, "le")
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = _format_labels(names, (*labels, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            suffix = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The set of metric families served at ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric family, replacing one with the same name."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metric families in exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    """Create and register a counter."""
+    return registry.register(Counter(name, documentation, labels))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Create and register a histogram."""
+    return registry.register(Histogram(name, documentation, labels, buckets))
+
+
+def gauge(
+    name: str,
+    documentation: str,
+    read: Callable[[], Dict[LabelValues, float]],
+    labels: Sequence[str] = (),
+) -> Gauge:
+    """Create and register a gauge read at render time."""
+    return registry.register(Gauge(name, documentation, read, labels))
+
+
+http_request_duration = histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by route template.",
+    ("method", "route", "status"),
+)
+http_request_phase_duration = histogram(
+    "http_request_phase_seconds",
+    "Time spent per request in each phase: pool_wait, db, map and encode.",
+    ("route", "phase"),
+)
+db_pool_wait = histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection."
+)
+db_connect_duration = histogram(
+    "db_connect_seconds", "Time to open and configure a new connection."
+)
+db_statement_duration = histogram(
+    "db_statement_duration_seconds",
+    "Time to execute a statement up to its first row, by normalized SQL.",
+    ("statement",),
+)
+db_fetch_seconds = counter(
+    "db_fetch_seconds_total",
+    "Time spent fetching rows after execution, by normalized SQL.",
+    ("statement",),
+)
+db_rows = counter(
+    "db_rows_total",
+    "Rows fetched from query results, by normalized SQL.",
+    ("statement",),
+)
+map_duration = histogram(
+    "response_map_seconds", "Time to map result rows to response payloads."
+)
+encode_duration = histogram(
+    "response_encode_seconds", "Time to encode response payloads as JSON."
+)
+
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_GROUP = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Reduce a statement to one form per query shape.
+
+    Whitespace is collapsed, ``IN (?, ?, ...)`` lists become ``(?...)`` and
+    repeated ``VALUES`` rows collapse to one, so batch statements of any
+    size normalize alike.
+    """
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST.sub("(?...)", sql)
+    return _REPEATED_GROUP.sub(r"\1, ...", sql)
+
+
+def sql_label(statement: str) -> str:
+    """Cut a normalized statement to a bounded label value."""
+    return statement[:METRICS_SQL_LABEL_LENGTH]
+
+
+class RequestTimings:
+    """Seconds spent in each phase of one request."""
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time to a phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """The phases as a ``Server-Timing`` header value, in milliseconds."""
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.2f}"
+            for phase, seconds in self.phases.items()
+        )
+
+
+# Set by the timing middleware; shared with database threads through run_db
+request_timings: contextvars.ContextVar[Optional[RequestTimings]] = (
+    contextvars.ContextVar("request_timings", default=None)
+)
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Attribute time to a phase of the current request, if any."""
+    timings = request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str, metric: Optional[Histogram] = None) -> Iterator[None]:
+    """Time a block into a request phase and, optionally, a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_phase(phase, elapsed)
+        if metric is not None:
+            metric.observe(elapsed)
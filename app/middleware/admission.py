@@ -0,0 +1,225 @@
+"""Admission control middleware.
+
+Requests are split into reads (``GET``, ``HEAD``, ``OPTIONS``) and writes.
+Each class can be capped at a number of requests in flight. A request over
+the cap waits up to ``ADMISSION_QUEUE_TIMEOUT_MS`` for a slot and is then
+shed with ``503``. Writes all end up on SQLite's single writer, so a small
+write cap keeps a burst of them from queueing behind the write lock and
+slowing reads down too.
+
+Clients can also be rate limited with a token bucket each: ``ADMISSION_RATE``
+requests per second with bursts of up to ``ADMISSION_BURST``. Clients over
+the limit get ``429``. Both responses carry ``Retry-After``.
+
+Every limit is off by default. Health checks and metrics are never limited.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+from pydantic_core import to_json
+
+from app.metrics import counter
+
+# Requests in flight per class; 0 means unlimited
+ADMISSION_MAX_READS = int(os.getenv("ADMISSION_MAX_READS", "0"))
+ADMISSION_MAX_WRITES = int(os.getenv("ADMISSION_MAX_WRITES", "0"))
+# How long a request over the cap may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "100"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Requests per second per client; 0 disables rate limiting
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "0"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", str(max(ADMISSION_RATE, 1))))
+# Identify clients by this header (e.g. X-Forwarded-For behind a proxy)
+# instead of the peer address
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").lower()
+# Proxies in front of the app that append to that header; the client is the
+# address the outermost of them saw
+ADMISSION_TRUSTED_HOPS = int(os.getenv("ADMISSION_TRUSTED_HOPS", "1"))
+# Clients tracked at once; the least recently seen are forgotten first
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+ADMISSION_EXEMPT_PATHS = ("/healthz", "/readyz", "/metrics")
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+admission_rejections = counter(
+    "http_requests_rejected_total",
+    "Requests shed by admission control, by request class and reason.",
+    ("class", "reason"),
+)
+
+
+class ConcurrencyLimit:
+    """Caps requests in flight, handing freed slots to waiters in order.
+
+    Only used from the event loop, so plain counters need no locking.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to ``timeout`` seconds; False if none."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        if timeout <= 0:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Cancelled after a slot was handed over: give it back
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return waiter.done() and not waiter.cancelled()
+
+    def release(self) -> None:
+        """Free a slot, passing it straight to the next waiter if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class TokenBuckets:
+    """A token bucket per client key."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # key -> (tokens, time of last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Spend a token; 0 if admitted, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def _reject(status: int, retry_after: float, detail: str):
+    """The ASGI messages of a JSON error response."""
+    body = to_json({"detail": detail})
+    return [
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+            ],
+        },
+        {"type": "http.response.body", "body": body},
+    ]
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that rate limits clients and sheds excess load."""
+
+    def __init__(
+        self,
+        app,
+        max_reads: int = ADMISSION_MAX_READS,
+        max_writes: int = ADMISSION_MAX_WRITES,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+        rate: float = ADMISSION_RATE,
+        burst: float = ADMISSION_BURST,
+        client_header: str = ADMISSION_CLIENT_HEADER,
+        trusted_hops: int = ADMISSION_TRUSTED_HOPS,
+        max_clients: int = ADMISSION_MAX_CLIENTS,
+        exempt_paths: Sequence[str] = ADMISSION_EXEMPT_PATHS,
+    ):
+        self.app = app
+        self.limits: Dict[str, ConcurrencyLimit] = {
+            name: ConcurrencyLimit(limit)
+            for name, limit in (("read", max_reads), ("write", max_writes))
+            if limit > 0
+        }
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.buckets = TokenBuckets(rate, burst, max_clients) if rate > 0 else None
+        self.client_header = client_header.lower().encode("latin-1")
+        self.trusted_hops = max(1, trusted_hops)
+        self.exempt_paths = frozenset(exempt_paths)
+
+    def client_key(self, scope) -> str:
+        """The rate limiting key of a request.
+
+        Clients can put anything in the left of a forwarded-for list, so the
+        key is the entry ``trusted_hops`` from the right, which our own
+        outermost proxy appended.
+        """
+        if self.client_header:
+            addresses = [
+                address.strip()
+                for name, value in scope.get("headers", [])
+                if name == self.client_header
+                for address in value.decode("latin-1").split(",")
+            ]
+            if addresses:
+                return addresses[-min(self.trusted_hops, len(addresses))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        kind = "read" if scope["method"] in READ_METHODS else "write"
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self.client_key(scope))
+            if wait:
+                admission_rejections.inc(kind, "rate_limited")
+                for message in _reject(429, wait, "Too many requests"):
+                    await send(message)
+                return
+
+        limit = self.limits.get(kind)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limit.acquire(self.queue_timeout):
+            admission_rejections.inc(kind, "overloaded")
+            for message in _reject(
+                503, self.retry_after, "Server is overloaded, retry later"
+            ):
+                await send(message)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -0,0 +1,325 @@
+"""Response compression with content negotiation.
+
+gzip is always available. Brotli is used when the ``brotli`` package is
+installed and zstd when Python ships ``compression.zstd`` (3.14+) or the
+``zstandard`` package is installed. Responses below ``COMPRESSION_MIN_SIZE``
+bytes, non-text media types and bodies that are already encoded pass through
+unchanged.
+
+Compressed bodies of responses that carry an ETag are kept in an LRU cache
+keyed by path, query, ETag and encoding, so clients polling an unchanged
+collection do not pay the compression cost on every request.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.cache import REPORTED_CACHES, LRUCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    from compression import zstd
+
+    _STDLIB_ZSTD = True
+except ImportError:
+    _STDLIB_ZSTD = False
+    try:
+        import zstandard as zstd
+    except ImportError:  # pragma: no cover - optional dependency
+        zstd = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# Server preference when the client accepts several encodings equally
+COMPRESSION_ENCODINGS = [
+    name.strip()
+    for name in os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",")
+    if name.strip()
+]
+
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "1000"))
+COMPRESSION_CACHE_MAX_BYTES = int(
+    os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+
+compressed_cache = LRUCache(
+    "compressed",
+    max_entries=COMPRESSION_CACHE_MAX_ENTRIES,
+    max_bytes=COMPRESSION_CACHE_MAX_BYTES,
+    ttl=0,
+)
+REPORTED_CACHES.append(compressed_cache)
+
+
+class _Encoder(NamedTuple):
+    """One-shot and streaming compression for a content coding."""
+
+    name: str
+    compress: Callable[[bytes], bytes]
+    # Returns the (compress, flush) pair of a new incremental stream
+    stream: Callable[[], Tuple[Callable[[bytes], bytes], Callable[[], bytes]]]
+
+
+def _gzip_stream():
+    """Start an incremental gzip stream."""
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _brotli_stream():
+    """Start an incremental brotli stream."""
+    compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+def _zstd_stream():
+    """Start an incremental zstd stream."""
+    if _STDLIB_ZSTD:
+        compressor = zstd.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL)
+        return compressor.compress, compressor.flush
+    compressor = zstd.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+    return compressor.compress, compressor.flush
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    """Compress a whole body as one zstd frame."""
+    if _STDLIB_ZSTD:
+        return zstd.compress(data, level=COMPRESSION_ZSTD_LEVEL)
+    return zstd.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+
+
+def available_encoders() -> Dict[str, _Encoder]:
+    """Get the encoders usable in this process, keyed by content coding."""
+    encoders = {
+        "gzip": _Encoder(
+            "gzip",
+            lambda data: gzip.compress(data, COMPRESSION_GZIP_LEVEL, mtime=0),
+            _gzip_stream,
+        )
+    }
+    if brotli is not None:
+        encoders["br"] = _Encoder(
+            "br",
+            lambda data: brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY),
+            _brotli_stream,
+        )
+    if zstd is not None:
+        encoders["zstd"] = _Encoder("zstd", _zstd_compress, _zstd_stream)
+    return encoders
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into codings and their q-values."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header: str, preference: List[str]) -> Optional[str]:
+    """Pick the best coding the client accepts, or ``None`` for identity."""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in preference:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses HTTP responses.
+
+    Whole responses are compressed in one shot and, when they carry an ETag,
+    cached. Streaming responses are compressed chunk by chunk. Any response
+    that could have been compressed, and any 304, carries
+    ``Vary: Accept-Encoding``, so shared caches keep one copy per coding.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        encodings: Optional[List[str]] = None,
+        cache: Optional[LRUCache] = compressed_cache,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = available_encoders()
+        self.preference = [
+            name
+            for name in (encodings or COMPRESSION_ENCODINGS)
+            if name in self.encoders
+        ]
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        coding = choose_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1"), self.preference
+        )
+        encoder = self.encoders[coding] if coding is not None else None
+        responder = _CompressingResponder(self, encoder, scope, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    """Wraps ``send`` to compress one response, or only mark it as varying.
+
+    ``encoder`` is ``None`` when the client accepts no supported coding.
+    """
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        encoder: Optional[_Encoder],
+        scope,
+        send,
+    ):
+        self.middleware = middleware
+        self.encoder = encoder
+        self.scope = scope
+        self.send = send
+        self.start: Optional[Dict[str, Any]] = None
+        self.passthrough = False
+        self.stream: Optional[Tuple[Callable, Callable]] = None
+
+    def _cache_key(self) -> Optional[Tuple[str, bytes, str, str]]:
+        """Key for the compressed body, if the response can be cached."""
+        etag = self._header(b"etag")
+        if self.middleware.cache is None or etag is None:
+            return None
+        return (
+            self.scope["path"],
+            self.scope.get("query_string", b""),
+            etag,
+            self.encoder.name,
+        )
+
+    def _header(self, name: bytes) -> Optional[str]:
+        for key, value in self.start["headers"]:
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
+
+    def _compressible(self) -> bool:
+        """Whether the response type and status allow compression."""
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if self._header(b"content-encoding") is not None:
+            return False
+        content_type = self._header(b"content-type") or ""
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _headers(
+        self, encoded: bool, length: Optional[int]
+    ) -> List[Tuple[bytes, bytes]]:
+        """Response headers marked as varying by Accept-Encoding.
+
+        ``length`` replaces Content-Length when the body was compressed, and
+        ``None`` drops it for a compressed stream.
+        """
+        dropped = (b"vary", b"content-length") if encoded else (b"vary",)
+        headers = [
+            (key, value)
+            for key, value in self.start["headers"]
+            if key.lower() not in dropped
+        ]
+        vary = self._header(b"vary")
+        vary_values = [v.strip() for v in vary.split(",")] if vary else []
+        if "accept-encoding" not in (v.lower() for v in vary_values):
+            vary_values.append("Accept-Encoding")
+        headers.append((b"vary", ", ".join(vary_values).encode("latin-1")))
+        if encoded:
+            headers.append((b"content-encoding", self.encoder.name.encode("latin-1")))
+            if length is not None:
+                headers.append((b"content-length", str(length).encode("latin-1")))
+        return headers
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            compressible = self._compressible()
+            if compressible and self.encoder is not None:
+                return
+            self.passthrough = True
+            # A 304 stands in for a 200 that would have varied
+            if compressible or message["status"] == 304:
+                message = {**message, "headers": self._headers(False, None)}
+            await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None and not more_body:
+            await self._send_whole(body)
+            return
+
+        if self.stream is None:
+            self.stream = self.encoder.stream()
+            await self.send(
+                {**self.start, "headers": self._headers(encoded=True, length=None)}
+            )
+        compress, flush = self.stream
+        chunk = compress(body) if body else b""
+        if not more_body:
+            chunk += flush()
+        await self.send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
+
+    async def _send_whole(self, body: bytes) -> None:
+        """Send a complete body, compressed if it is large enough."""
+        if len(body) < self.middleware.minimum_size:
+            await self.send(
+                {**self.start, "headers": self._headers(encoded=False, length=None)}
+            )
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        key = self._cache_key()
+        cache = self.middleware.cache
+        compressed = cache.get(key) if key is not None else None
+        if compressed is None:
+            compressed = self.encoder.compress(body)
+            if key is not None:
+                cache.set(key, compressed)
+        await self.send(
+            {
+                **self.start,
+                "headers": self._headers(encoded=True, length=len(compressed)),
+            }
+        )
+        await self.send({"type": "http.response.body", "body": compressed})
@@ -0,0 +1,72 @@
+"""Request timing middleware.
+
+Every HTTP request is timed into ``http_request_duration_seconds``, labelled
+by the route template rather than the raw path so ids do not explode the
+label set. Time spent waiting for a connection, running SQL, mapping rows to
+payloads and encoding JSON is collected per request and recorded per phase.
+With ``server_timing`` on, it is also returned in a ``Server-Timing`` header,
+so a single slow response can be read in the browser's network panel.
+"""
+
+import time
+
+from app.metrics import (
+    RequestTimings,
+    http_request_duration,
+    http_request_phase_duration,
+    request_timings,
+)
+
+
+def route_label(scope) -> str:
+    """The matched route template, or ``unmatched``."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class TimingMiddleware:
+    """ASGI middleware that records request latency and its breakdown."""
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if not self.server_timing:
+                    await send(message)
+                    return
+                timings.add("total", time.perf_counter() - start)
+                header = timings.server_timing().encode("latin-1")
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (b"server-timing", header),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            route = route_label(scope)
+            http_request_duration.observe(
+                time.perf_counter() - start, scope["method"], route, str(status_code)
+            )
+            for phase, seconds in timings.phases.items():
+                if phase != "total":
+                    http_request_phase_duration.observe(seconds, route, phase)
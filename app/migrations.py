@@ -0,0 +1,366 @@
+"""Versioned schema migrations.
+
+The schema version is stored in SQLite's ``user_version`` header field. Each
+migration runs in its own ``BEGIN IMMEDIATE`` transaction, so concurrent
+workers starting at the same time apply every step exactly once.
+"""
+
+import sqlite3
+from typing import List, NamedTuple
+
+
+class Migration(NamedTuple):
+    """A numbered schema change."""
+
+    version: int
+    description: str
+    statements: List[str]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "Create users, posts and todos tables",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                userId TEXT NOT NULL UNIQUE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                userId TEXT NOT NULL,
+                createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (userId) REFERENCES users(userId)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS todos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                completed BOOLEAN NOT NULL DEFAULT FALSE
+            )
+            """,
+        ],
+    ),
+    Migration(
+        2,
+        "Index posts for per-user and newest-first listings",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_posts_user_created ON posts (userId, createdAt DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_created ON posts (createdAt DESC)",
+        ],
+    ),
+    Migration(
+        3,
+        "Add id tiebreakers to post indexes for keyset pagination",
+        [
+            "DROP INDEX IF EXISTS idx_posts_created",
+            "DROP INDEX IF EXISTS idx_posts_user_created",
+            "CREATE INDEX IF NOT EXISTS idx_posts_created_id ON posts (createdAt DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_user_created_id ON posts (userId, createdAt DESC, id DESC)",
+        ],
+    ),
+    Migration(
+        4,
+        "Log updated and deleted rows for cross-process cache invalidation",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                entityId NOT NULL
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_update_invalidate AFTER UPDATE ON users
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('users', OLD.userId);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_delete_invalidate AFTER DELETE ON users
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('users', OLD.userId);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_update_invalidate AFTER UPDATE ON posts
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('posts', OLD.id);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_delete_invalidate AFTER DELETE ON posts
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('posts', OLD.id);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_update_invalidate AFTER UPDATE ON todos
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('todos', OLD.id);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_delete_invalidate AFTER DELETE ON todos
+            BEGIN
+                INSERT INTO cache_invalidations (entity, entityId) VALUES ('todos', OLD.id);
+            END
+            """,
+        ],
+    ),
+    Migration(
+        5,
+        "Track updatedAt per row and a change counter per table",
+        [
+            "ALTER TABLE users ADD COLUMN updatedAt TIMESTAMP",
+            "ALTER TABLE posts ADD COLUMN updatedAt TIMESTAMP",
+            "ALTER TABLE todos ADD COLUMN updatedAt TIMESTAMP",
+            "UPDATE users SET updatedAt = CURRENT_TIMESTAMP",
+            "UPDATE posts SET updatedAt = coalesce(createdAt, CURRENT_TIMESTAMP)",
+            "UPDATE todos SET updatedAt = CURRENT_TIMESTAMP",
+            # The backfill changed no content; workers that see the gap clear
+            # their caches once instead of replaying every row
+            "DELETE FROM cache_invalidations",
+            """
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "INSERT OR IGNORE INTO table_versions (name) VALUES ('users'), ('posts'), ('todos')",
+            """
+            CREATE TRIGGER IF NOT EXISTS users_insert_version AFTER INSERT ON users
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'users';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_update_version AFTER UPDATE ON users
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'users';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_delete_version AFTER DELETE ON users
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'users';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_insert_version AFTER INSERT ON posts
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'posts';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_update_version AFTER UPDATE ON posts
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'posts';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_delete_version AFTER DELETE ON posts
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'posts';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_insert_version AFTER INSERT ON todos
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'todos';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_update_version AFTER UPDATE ON todos
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'todos';
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_delete_version AFTER DELETE ON todos
+            BEGIN
+                UPDATE table_versions
+                SET version = version + 1, updatedAt = CURRENT_TIMESTAMP
+                WHERE name = 'todos';
+            END
+            """,
+        ],
+    ),
+    Migration(
+        6,
+        "Index post titles and bodies for full-text search",
+        [
+            # The index stores its own copy of the text so single rows can be
+            # removed by rowid, which lets the index be rebuilt in batches
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                title, body, tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """,
+            # Rank title matches above body matches
+            "INSERT INTO posts_fts (posts_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+            "INSERT INTO posts_fts (rowid, title, body) SELECT id, title, body FROM posts",
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_insert_search AFTER INSERT ON posts
+            BEGIN
+                INSERT INTO posts_fts (rowid, title, body) VALUES (NEW.id, NEW.title, NEW.body);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_update_search AFTER UPDATE OF title, body ON posts
+            BEGIN
+                DELETE FROM posts_fts WHERE rowid = OLD.id;
+                INSERT INTO posts_fts (rowid, title, body) VALUES (NEW.id, NEW.title, NEW.body);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_delete_search AFTER DELETE ON posts
+            BEGIN
+                DELETE FROM posts_fts WHERE rowid = OLD.id;
+            END
+            """,
+        ],
+    ),
+    Migration(
+        7,
+        "Index todos by completion for filtered listings",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_todos_completed_id ON todos (completed, id DESC)",
+        ],
+    ),
+    Migration(
+        8,
+        "Maintain todo and per-user post counters for stats",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS todo_counts (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            INSERT OR REPLACE INTO todo_counts (id, total, completed)
+            SELECT 1, count(*), coalesce(sum(completed != 0), 0) FROM todos
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_post_counts (
+                userId TEXT PRIMARY KEY,
+                posts INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            INSERT OR REPLACE INTO user_post_counts (userId, posts)
+            SELECT userId, count(*) FROM posts
+            WHERE userId IN (SELECT userId FROM users)
+            GROUP BY userId
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_insert_counts AFTER INSERT ON todos
+            BEGIN
+                UPDATE todo_counts
+                SET total = total + 1, completed = completed + (NEW.completed != 0)
+                WHERE id = 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_update_counts AFTER UPDATE OF completed ON todos
+            BEGIN
+                UPDATE todo_counts
+                SET completed = completed + (NEW.completed != 0) - (OLD.completed != 0)
+                WHERE id = 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS todos_delete_counts AFTER DELETE ON todos
+            BEGIN
+                UPDATE todo_counts
+                SET total = total - 1, completed = completed - (OLD.completed != 0)
+                WHERE id = 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_insert_counts AFTER INSERT ON posts
+            BEGIN
+                INSERT INTO user_post_counts (userId, posts) VALUES (NEW.userId, 1)
+                ON CONFLICT (userId) DO UPDATE SET posts = posts + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_update_counts AFTER UPDATE OF userId ON posts
+            BEGIN
+                UPDATE user_post_counts SET posts = posts - 1 WHERE userId = OLD.userId;
+                INSERT INTO user_post_counts (userId, posts) VALUES (NEW.userId, 1)
+                ON CONFLICT (userId) DO UPDATE SET posts = posts + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_delete_counts AFTER DELETE ON posts
+            BEGIN
+                UPDATE user_post_counts SET posts = posts - 1 WHERE userId = OLD.userId;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS users_delete_counts AFTER DELETE ON users
+            BEGIN
+                DELETE FROM user_post_counts WHERE userId = OLD.userId;
+            END
+            """,
+        ],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    """Apply pending migrations up to ``target`` and return the new version."""
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+        if migration.version <= get_schema_version(conn):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have applied it while we waited for the lock
+            if migration.version > get_schema_version(conn):
+                for statement in migration.statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return get_schema_version(conn)
@@ -1,7 +1,7 @@
 """Post models."""
 
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 
 from app.models.user import User
@@ -87,3 +87,20 @@ class PostResponse(PostBase):
             }
         },
     )
+
+
+class PostSearchResult(PostResponse):
+    """Post search hit with a highlighted excerpt."""
+
+    snippet: str = Field(
+        ..., description="HTML-escaped excerpt with matches wrapped in <mark>"
+    )
+
+
+class PostsWithAuthors(BaseModel):
+    """Page of posts that reference their authors by userId."""
+
+    posts: List[Post]
+    authors: Dict[str, User] = Field(
+        ..., description="Authors of the posts on this page, keyed by userId"
+    )
@@ -74,3 +74,14 @@ class TodoList(BaseModel):
             }
         }
     )
+
+
+class TodoStats(BaseModel):
+    """Todo counts."""
+
+    total: int
+    completed: int
+    open: int
+    model_config = ConfigDict(
+        json_schema_extra={"example": {"total": 3, "completed": 1, "open": 2}}
+    )
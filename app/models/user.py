@@ -45,3 +45,18 @@ class UserUpdate(BaseModel):
             "example": {"name": "John Smith", "email": "john.smith@example.com"}
         }
     )
+
+
+class UserStats(BaseModel):
+    """Counts of a user's content."""
+
+    userId: str
+    posts: int
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "userId": "123e4567-e89b-12d3-a456-426614174000",
+                "posts": 12,
+            }
+        }
+    )
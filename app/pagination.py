@@ -0,0 +1,80 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url-wrapped so clients treat it as an opaque token. The next page is
+read with a ``WHERE (key...) < (?...)`` seek on an index instead of OFFSET,
+so every page costs the same no matter how deep it is.
+"""
+
+import base64
+import binascii
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Query, status
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+LimitQuery = Query(
+    DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum items to return"
+)
+AfterQuery = Query(
+    None,
+    description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page",
+)
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Encode a row's sort key as an opaque cursor."""
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _matches(value: Any, expected: Type) -> bool:
+    """Whether a decoded cursor value has the type of its key column."""
+    if isinstance(value, bool):
+        return False
+    if expected is float:
+        # JSON does not keep 1.0 apart from 1
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[Type]) -> Optional[List[Any]]:
+    """Decode a cursor into a sort key with one value of each of ``types``."""
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        key = None
+    if (
+        not isinstance(key, list)
+        or len(key) != len(types)
+        or not all(map(_matches, key, types))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return key
+
+
+def split_page(
+    rows: List[Any], limit: int, key_of: Callable[[Any], Sequence[Any]]
+) -> Tuple[List[Any], Optional[str]]:
+    """Split ``limit + 1`` fetched rows into a page and the next cursor."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key_of(page[-1]))
+
+
+def page_headers(next_cursor: Optional[str]) -> Dict[str, str]:
+    """Response headers announcing the next page, if there is one."""
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
@@ -0,0 +1,50 @@
+"""Router for operational introspection."""
+
+from fastapi import APIRouter, status
+
+from app.cache import CACHES
+from app.database import (
+    DB_PROFILE,
+    DB_SLOW_QUERY_MS,
+    get_pool,
+    read_pragmas,
+    run_db,
+    slow_queries,
+)
+from app.middleware.compression import compressed_cache
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+
+@router.get("/database")
+async def get_database_settings():
+    """Get the active database profile and the PRAGMAs in effect."""
+    pool = get_pool()
+    return {
+        "profile": DB_PROFILE,
+        "path": str(pool.db_path),
+        "pool": {"maxSize": pool.max_size, "size": pool.size, "idle": pool.idle},
+        "pragmas": await run_db(read_pragmas),
+    }
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get hit, miss and eviction counters for each cache."""
+    return {cache.name: cache.stats() for cache in [*CACHES, compressed_cache]}
+
+
+@router.get("/slow-queries")
+async def get_slow_queries():
+    """Get the slowest statements seen by this worker, slowest first."""
+    return {"thresholdMs": DB_SLOW_QUERY_MS, "queries": slow_queries.top()}
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    """Forget the recorded slow statements."""
+    slow_queries.clear()
+    return None
@@ -0,0 +1,30 @@
+"""Router for liveness and readiness probes."""
+
+import asyncio
+import math
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.health import HEALTH_CACHE_SECONDS, readiness
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/healthz")
+async def get_liveness():
+    """Report that the process is serving requests, without any I/O."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def get_readiness():
+    """Report whether the database can take traffic; 503 when degraded."""
+    result = readiness.cached() or await asyncio.to_thread(readiness.check)
+    if result["status"] == "ok":
+        return result
+    return JSONResponse(
+        result,
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(math.ceil(HEALTH_CACHE_SECONDS))},
+    )
@@ -0,0 +1,13 @@
+"""Router exposing metrics in the Prometheus text format."""
+
+from fastapi import APIRouter, Response
+
+from app.metrics import CONTENT_TYPE, registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics():
+    """Get request and database metrics of this worker process."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,10 +1,49 @@
 """Router for post operations."""
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from app.database import get_db
-from app.models.post import PostCreate, PostUpdate, PostResponse
-from app.models.user import User
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+from app.cache import posts_cache, read_through
+from app.conditional import (
+    conditional_headers,
+    entity_response,
+    load_if_modified,
+    make_entity,
+    not_modified_response,
+    query_variant,
+)
+from app.database import run_blocking, run_db
+from app.writer import run_write
+from app.fields import Column, FieldSet, fields_query, single
+from app.metrics import map_duration, timed
+from app.pagination import (
+    AfterQuery,
+    LimitQuery,
+    decode_cursor,
+    page_headers,
+    split_page,
+)
+from app.search import SEARCH_COLUMNS, match_expression, search_key, search_row_to_dict
+from app.serialization import (
+    NDJSON_MEDIA_TYPE,
+    format_timestamp,
+    iter_ndjson,
+    iter_rows,
+    json_response,
+    map_rows,
+    post_row_to_dict,
+    to_sql_timestamp,
+    user_row_to_dict,
+)
+from app.models.post import (
+    PostCreate,
+    PostUpdate,
+    PostResponse,
+    PostSearchResult,
+    PostsWithAuthors,
+)
 
 router = APIRouter(
     prefix="/posts",
@@ -12,247 +51,414 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Fields selectable with ``fields=`` on post listings
+POST_FIELDS = FieldSet(
+    {
+        "id": single("p.id"),
+        "title": single("p.title"),
+        "body": single("p.body"),
+        "createdAt": single("p.createdAt", format_timestamp),
+        "userId": single("p.userId"),
+        "author": Column(("u.id", "u.name", "u.email", "u.userId"), user_row_to_dict),
+    },
+    key=["p.createdAt", "p.id"],
+    defaults=["id", "title", "body", "createdAt", "author"],
+)
+
+# Author columns appended to normalized listings, read back from the row end
+AUTHOR_COLUMNS = "u.id, u.name, u.email, u.userId"
+
+IncludeQuery = Query(
+    None,
+    description="authors: return {posts, authors} with each author listed once",
+)
+
+CreatedSinceQuery = Query(
+    None, description="Only posts created at or after this time (UTC if naive)"
+)
+CreatedBeforeQuery = Query(
+    None, description="Only posts created before this time (UTC if naive)"
+)
+
+
+def _create_post(db, post: PostCreate):
+    """Insert a post and return it with its author."""
+    cursor = db.cursor()
+
+    # Verify user exists
+    cursor.execute(
+        "SELECT id, name, email, userId FROM users WHERE userId = ?", (post.userId,)
+    )
+    user = cursor.fetchone()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    # Create post
+    cursor.execute(
+        "INSERT INTO posts (title, body, userId, updatedAt) "
+        "VALUES (?, ?, ?, CURRENT_TIMESTAMP) "
+        "RETURNING id, title, body, createdAt",
+        (post.title, post.body, post.userId),
+    )
+    created_post = cursor.fetchone()
+
+    # The author is the user row loaded above
+    return post_row_to_dict((*created_post, *user))
+
 
 @router.post("/", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
 async def create_post(post: PostCreate):
     """Create a new post."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Verify user exists
-        cursor.execute(
-            "SELECT id, name, email, userId FROM users WHERE userId = ?", (post.userId,)
-        )
-        user = cursor.fetchone()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
-
-        # Create post
-        cursor.execute(
-            "INSERT INTO posts (title, body, userId) VALUES (?, ?, ?)",
-            (post.title, post.body, post.userId),
-        )
-        post_id = cursor.lastrowid
-        db.commit()
-
-        # Get the created post with author info
-        cursor.execute(
-            """
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            WHERE p.id = ?
-        """,
-            (post_id,),
+    return json_response(
+        await run_write(_create_post, post), status_code=status.HTTP_201_CREATED
+    )
+
+
+def _get_posts(
+    db,
+    limit: int,
+    after: Optional[str],
+    fields: List[str],
+    user_id: Optional[str] = None,
+    created_since: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    include_authors: bool = False,
+):
+    """Load one page of posts with the selected fields, newest first.
+
+    With ``include_authors`` posts carry their ``userId`` and the page is
+    returned as ``{"posts": [...], "authors": {userId: author}}``.
+    """
+    key = decode_cursor(after, (str, int))
+    if include_authors:
+        fields = [name for name in fields if name != "author"]
+        if "userId" not in fields:
+            fields.append("userId")
+    columns, to_dict = POST_FIELDS.select(fields)
+    if include_authors:
+        columns = f"{columns}, {AUTHOR_COLUMNS}"
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append("p.userId = ?")
+        params.append(user_id)
+    if created_since is not None:
+        conditions.append("p.createdAt >= ?")
+        params.append(to_sql_timestamp(created_since))
+    if created_before is not None:
+        conditions.append("p.createdAt < ?")
+        params.append(to_sql_timestamp(created_before))
+    if key:
+        conditions.append("(p.createdAt, p.id) < (?, ?)")
+        params.extend(key)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = db.cursor()
+    cursor.execute(
+        f"""
+        SELECT {columns}
+        FROM posts p
+        JOIN users u ON p.userId = u.userId
+        {where}
+        ORDER BY p.createdAt DESC, p.id DESC
+        LIMIT ?
+    """,
+        (*params, limit + 1),
+    )
+    posts, next_cursor = split_page(
+        cursor.fetchall(), limit, lambda row: (row[0], row[1])
+    )
+
+    if include_authors:
+        # Each author is decoded once, however many posts they wrote
+        authors = {}
+        with timed("map", map_duration):
+            for post in posts:
+                if post[-1] not in authors:
+                    authors[post[-1]] = user_row_to_dict(post, len(post) - 4)
+        return {
+            "posts": map_rows(posts, to_dict),
+            "authors": authors,
+        }, next_cursor
+
+    return map_rows(posts, to_dict), next_cursor
+
+
+@router.get("/", response_model=Union[List[PostResponse], PostsWithAuthors])
+async def get_posts(
+    request: Request,
+    limit: int = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    userId: Optional[str] = Query(None, description="Only posts by this user"),
+    createdSince: Optional[datetime] = CreatedSinceQuery,
+    createdBefore: Optional[datetime] = CreatedBeforeQuery,
+    fields: Optional[str] = fields_query(POST_FIELDS.fields),
+    include: Optional[Literal["authors"]] = IncludeQuery,
+):
+    """Get a page of posts with author information, newest first."""
+    page, validators = await run_db(
+        load_if_modified,
+        ("posts", "users"),
+        conditional_headers(request),
+        _get_posts,
+        limit,
+        after,
+        POST_FIELDS.parse(fields),
+        userId,
+        createdSince,
+        createdBefore,
+        include == "authors",
+        variant=query_variant(request),
+    )
+    if page is None:
+        return not_modified_response(validators)
+    posts, next_cursor = page
+    return json_response(
+        posts, headers={**page_headers(next_cursor), **validators.headers()}
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_posts():
+    """Stream every post with its author as newline-delimited JSON."""
+    rows = iter_rows("""
+        SELECT p.id, p.title, p.body, p.createdAt,
+               u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
+        FROM posts p
+        JOIN users u ON p.userId = u.userId
+        ORDER BY p.createdAt DESC, p.id DESC
+    """)
+    return StreamingResponse(
+        iter_ndjson(rows, post_row_to_dict), media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+def _search_posts(db, q: str, limit: int, after: Optional[str]):
+    """Load one page of posts matching ``q``, best match first."""
+    key = decode_cursor(after, (float, int))
+    expression = match_expression(q)
+    if expression is None:
+        return [], None
+
+    where = "AND (f.rank, p.id) > (?, ?)" if key else ""
+    cursor = db.cursor()
+    cursor.execute(
+        f"""
+        SELECT {SEARCH_COLUMNS}
+        FROM posts_fts f
+        JOIN posts p ON p.id = f.rowid
+        JOIN users u ON p.userId = u.userId
+        WHERE posts_fts MATCH ? {where}
+        ORDER BY f.rank, p.id
+        LIMIT ?
+    """,
+        (expression, *(key or ()), limit + 1),
+    )
+    posts, next_cursor = split_page(cursor.fetchall(), limit, search_key)
+
+    return map_rows(posts, search_row_to_dict), next_cursor
+
+
+@router.get("/search", response_model=List[PostSearchResult])
+async def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find"),
+    limit: int = LimitQuery,
+    after: Optional[str] = AfterQuery,
+):
+    """Search post titles and bodies, best match first."""
+    page, validators = await run_db(
+        load_if_modified,
+        ("posts", "users"),
+        conditional_headers(request),
+        _search_posts,
+        q,
+        limit,
+        after,
+        variant=query_variant(request),
+    )
+    if page is None:
+        return not_modified_response(validators)
+    posts, next_cursor = page
+    return json_response(
+        posts, headers={**page_headers(next_cursor), **validators.headers()}
+    )
+
+
+def _get_post(db, post_id: int):
+    """Load one post with its author."""
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        SELECT p.id, p.title, p.body, p.createdAt,
+               u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId,
+               max(p.updatedAt, u.updatedAt) as updatedAt
+        FROM posts p
+        JOIN users u ON p.userId = u.userId
+        WHERE p.id = ?
+    """,
+        (post_id,),
+    )
+    post = cursor.fetchone()
+
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
         )
-        created_post = cursor.fetchone()
-
-        return PostResponse(
-            id=created_post[0],
-            title=created_post[1],
-            body=created_post[2],
-            createdAt=created_post[3],
-            author=User(
-                id=created_post[4],
-                name=created_post[5],
-                email=created_post[6],
-                userId=created_post[7],
-            ),
-        )
-
 
-@router.get("/", response_model=List[PostResponse])
-async def get_posts():
-    """Get all posts with author information."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            ORDER BY p.createdAt DESC
-        """)
-        posts = cursor.fetchall()
-
-        return [
-            PostResponse(
-                id=post[0],
-                title=post[1],
-                body=post[2],
-                createdAt=post[3],
-                author=User(id=post[4], name=post[5], email=post[6], userId=post[7]),
-            )
-            for post in posts
-        ]
+    # The author's userId tags the cache entry
+    return make_entity(post_row_to_dict(post), post[8]), post[7]
 
 
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: int):
+async def get_post(post_id: int, request: Request):
     """Get a specific post by ID with author information."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            WHERE p.id = ?
-        """,
-            (post_id,),
-        )
-        post = cursor.fetchone()
-
-        if not post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
-            )
-
-        return PostResponse(
-            id=post[0],
-            title=post[1],
-            body=post[2],
-            createdAt=post[3],
-            author=User(id=post[4], name=post[5], email=post[6], userId=post[7]),
+    entity = await run_blocking(read_through, posts_cache, post_id, _get_post, post_id)
+    return entity_response(request, entity)
+
+
+def _get_user_posts(
+    db,
+    userId: str,
+    limit: int,
+    after: Optional[str],
+    fields: List[str],
+    created_since: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    include_authors: bool = False,
+):
+    """Load one page of a user's posts, newest first."""
+    # Check if user exists
+    cursor = db.cursor()
+    cursor.execute("SELECT id FROM users WHERE userId = ?", (userId,))
+    if not cursor.fetchone():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
+    return _get_posts(
+        db,
+        limit,
+        after,
+        fields,
+        userId,
+        created_since,
+        created_before,
+        include_authors,
+    )
+
 
-@router.get("/user/{userId}", response_model=List[PostResponse])
-async def get_user_posts(userId: str):
-    """Get all posts by a specific user."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE userId = ?", (userId,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
-
-        # Get user's posts with author info
-        cursor.execute(
-            """
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            WHERE p.userId = ?
-            ORDER BY p.createdAt DESC
-        """,
-            (userId,),
+@router.get(
+    "/user/{userId}", response_model=Union[List[PostResponse], PostsWithAuthors]
+)
+async def get_user_posts(
+    userId: str,
+    request: Request,
+    limit: int = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    createdSince: Optional[datetime] = CreatedSinceQuery,
+    createdBefore: Optional[datetime] = CreatedBeforeQuery,
+    fields: Optional[str] = fields_query(POST_FIELDS.fields),
+    include: Optional[Literal["authors"]] = IncludeQuery,
+):
+    """Get a page of posts by a specific user, newest first."""
+    page, validators = await run_db(
+        load_if_modified,
+        ("posts", "users"),
+        conditional_headers(request),
+        _get_user_posts,
+        userId,
+        limit,
+        after,
+        POST_FIELDS.parse(fields),
+        createdSince,
+        createdBefore,
+        include == "authors",
+        variant=query_variant(request),
+    )
+    if page is None:
+        return not_modified_response(validators)
+    posts, next_cursor = page
+    return json_response(
+        posts, headers={**page_headers(next_cursor), **validators.headers()}
+    )
+
+
+def _update_post(db, post_id: int, post_update: PostUpdate):
+    """Apply a partial update to a post."""
+    cursor = db.cursor()
+
+    # Check if post exists
+    cursor.execute(
+        """
+        SELECT p.id, p.title, p.body, p.createdAt,
+               u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
+        FROM posts p
+        JOIN users u ON p.userId = u.userId
+        WHERE p.id = ?
+    """,
+        (post_id,),
+    )
+    existing_post = cursor.fetchone()
+    if not existing_post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
         )
-        posts = cursor.fetchall()
 
-        return [
-            PostResponse(
-                id=post[0],
-                title=post[1],
-                body=post[2],
-                createdAt=post[3],
-                author=User(id=post[4], name=post[5], email=post[6], userId=post[7]),
-            )
-            for post in posts
-        ]
+    # Update post fields
+    update_fields = []
+    values = []
+    if post_update.title is not None:
+        update_fields.append("title = ?")
+        values.append(post_update.title)
+    if post_update.body is not None:
+        update_fields.append("body = ?")
+        values.append(post_update.body)
+
+    if not update_fields:
+        return post_row_to_dict(existing_post)
+
+    values.append(post_id)
+    cursor.execute(
+        f"UPDATE posts SET {', '.join(update_fields)}, updatedAt = CURRENT_TIMESTAMP "
+        "WHERE id = ? "
+        "RETURNING id, title, body, createdAt",
+        values,
+    )
+    updated_post = cursor.fetchone()
+
+    # The author is unchanged by the update
+    return post_row_to_dict((*updated_post, *existing_post[4:]))
 
 
 @router.put("/{post_id}", response_model=PostResponse)
 async def update_post(post_id: int, post_update: PostUpdate):
     """Update a post."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Check if post exists
-        cursor.execute(
-            """
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            WHERE p.id = ?
-        """,
-            (post_id,),
-        )
-        existing_post = cursor.fetchone()
-        if not existing_post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
-            )
-
-        # Update post fields
-        update_fields = []
-        values = []
-        if post_update.title is not None:
-            update_fields.append("title = ?")
-            values.append(post_update.title)
-        if post_update.body is not None:
-            update_fields.append("body = ?")
-            values.append(post_update.body)
-
-        if not update_fields:
-            return PostResponse(
-                id=existing_post[0],
-                title=existing_post[1],
-                body=existing_post[2],
-                createdAt=existing_post[3],
-                author=User(
-                    id=existing_post[4],
-                    name=existing_post[5],
-                    email=existing_post[6],
-                    userId=existing_post[7],
-                ),
-            )
-
-        values.append(post_id)
-        query = f"UPDATE posts SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(query, values)
-        db.commit()
-
-        # Fetch updated post with author info
-        cursor.execute(
-            """
-            SELECT p.id, p.title, p.body, p.createdAt,
-                   u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId
-            FROM posts p
-            JOIN users u ON p.userId = u.userId
-            WHERE p.id = ?
-        """,
-            (post_id,),
-        )
-        updated_post = cursor.fetchone()
-
-        return PostResponse(
-            id=updated_post[0],
-            title=updated_post[1],
-            body=updated_post[2],
-            createdAt=updated_post[3],
-            author=User(
-                id=updated_post[4],
-                name=updated_post[5],
-                email=updated_post[6],
-                userId=updated_post[7],
-            ),
+    post = await run_write(_update_post, post_id, post_update)
+    posts_cache.invalidate(post_id)
+    return json_response(post)
+
+
+def _delete_post(db, post_id: int):
+    """Delete a post."""
+    cursor = db.cursor()
+
+    # Check if post exists
+    cursor.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
+    if not cursor.fetchone():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
         )
 
+    # Delete post
+    cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+    return None
+
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_post(post_id: int):
     """Delete a post."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Check if post exists
-        cursor.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Post not found"
-            )
-
-        # Delete post
-        cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
-        db.commit()
-        return None
+    await run_write(_delete_post, post_id)
+    posts_cache.invalidate(post_id)
+    return None
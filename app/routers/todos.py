@@ -1,9 +1,44 @@
 """Todos router."""
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from app.database import get_db
-from app.models.todo import Todo, TodoCreate, TodoUpdate, TodoBatchUpdate
+import os
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.cache import read_through, todos_cache
+from app.conditional import (
+    conditional_headers,
+    entity_response,
+    load_if_modified,
+    make_entity,
+    not_modified_response,
+    query_variant,
+)
+from app.database import run_blocking, run_db
+from app.writer import run_write
+from app.fields import FieldSet, fields_query, single
+from app.pagination import (
+    AfterQuery,
+    LimitQuery,
+    decode_cursor,
+    page_headers,
+    split_page,
+)
+from app.serialization import (
+    NDJSON_MEDIA_TYPE,
+    iter_ndjson,
+    iter_rows,
+    json_response,
+    map_rows,
+    todo_row_to_dict,
+)
+from app.models.todo import (
+    Todo,
+    TodoCreate,
+    TodoCreateBatch,
+    TodoUpdate,
+    TodoBatchUpdate,
+    TodoStats,
+)
 
 router = APIRouter(
     prefix="/todos",
@@ -11,155 +46,338 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Largest accepted batch, and rows inserted per statement and commit
+TODO_BATCH_MAX_SIZE = int(os.getenv("TODO_BATCH_MAX_SIZE", "10000"))
+TODO_BATCH_CHUNK_SIZE = int(os.getenv("TODO_BATCH_CHUNK_SIZE", "500"))
+
+# Fields selectable with ``fields=`` on the todo listing
+TODO_FIELDS = FieldSet(
+    {
+        "id": single("id"),
+        "task": single("task"),
+        "completed": single("completed", bool),
+    },
+    key=["id"],
+)
+
+
+def _create_todo(db, todo: TodoCreate):
+    """Insert a todo and return it."""
+    cursor = db.cursor()
+    cursor.execute(
+        "INSERT INTO todos (task, completed, updatedAt) "
+        "VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "RETURNING id, task, completed",
+        (todo.task, todo.completed),
+    )
+    todo_data = cursor.fetchone()
+    return todo_row_to_dict(todo_data)
+
 
 @router.post("/", response_model=Todo, status_code=status.HTTP_201_CREATED)
 async def create_todo(todo: TodoCreate):
     """Create a new todo."""
-    with get_db() as db:
-        cursor = db.cursor()
+    return json_response(
+        await run_write(_create_todo, todo), status_code=status.HTTP_201_CREATED
+    )
+
+
+def _create_todos_batch(db, todos: List[TodoCreate]):
+    """Insert todos with multi-row INSERT ... RETURNING statements.
+
+    Batches up to TODO_BATCH_CHUNK_SIZE rows are all-or-nothing. Larger ones
+    commit chunk by chunk so the write lock is released between chunks.
+    """
+    cursor = db.cursor()
+    created_todos = []
+
+    for start in range(0, len(todos), TODO_BATCH_CHUNK_SIZE):
+        chunk = todos[start : start + TODO_BATCH_CHUNK_SIZE]
+        placeholders = ", ".join(["(?, ?, CURRENT_TIMESTAMP)"] * len(chunk))
+        params = [value for todo in chunk for value in (todo.task, todo.completed)]
         cursor.execute(
-            "INSERT INTO todos (task, completed) VALUES (?, ?)",
-            (todo.task, todo.completed),
+            f"INSERT INTO todos (task, completed, updatedAt) VALUES {placeholders} "
+            "RETURNING id, task, completed",
+            params,
         )
+        rows = sorted(cursor.fetchall(), key=lambda row: row[0])
         db.commit()
+        created_todos.extend(map_rows(rows, todo_row_to_dict))
+
+    return created_todos
+
+
+@router.post("/batch", response_model=List[Todo], status_code=status.HTTP_201_CREATED)
+async def create_todos_batch(batch: TodoCreateBatch):
+    """Create multiple todos at once."""
+    if len(batch.todos) > TODO_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {TODO_BATCH_MAX_SIZE} todos",
+        )
+    # Commits chunk by chunk itself, so it does not go through run_write
+    return json_response(
+        await run_db(_create_todos_batch, batch.todos),
+        status_code=status.HTTP_201_CREATED,
+    )
+
 
-        # Fetch the created todo
-        cursor.execute("SELECT * FROM todos WHERE id = ?", (cursor.lastrowid,))
-        todo_data = cursor.fetchone()
-        return Todo(id=todo_data[0], task=todo_data[1], completed=todo_data[2])
+def _update_todos_batch(db, todos: List[TodoBatchUpdate]):
+    """Apply several todo updates with a fixed number of statements.
+
+    One ``WHERE id IN (...)`` query checks existence and loads current rows,
+    then one ``UPDATE ... FROM (VALUES ...) RETURNING`` applies every change,
+    each per TODO_BATCH_CHUNK_SIZE todos. Repeated ids are merged in request
+    order and every occurrence reports the final row.
+    """
+    cursor = db.cursor()
+    ids = list(dict.fromkeys(todo_update.id for todo_update in todos))
+
+    # Check that every todo exists, loading the current rows
+    rows = {}
+    for start in range(0, len(ids), TODO_BATCH_CHUNK_SIZE):
+        chunk = ids[start : start + TODO_BATCH_CHUNK_SIZE]
+        cursor.execute(
+            "SELECT id, task, completed FROM todos "
+            f"WHERE id IN ({', '.join(['?'] * len(chunk))})",
+            chunk,
+        )
+        rows.update((row[0], row) for row in cursor.fetchall())
+    for todo_update in todos:
+        if todo_update.id not in rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Todo with id {todo_update.id} not found",
+            )
+
+    # Merge the requested changes per todo
+    changes = {}
+    for todo_update in todos:
+        if todo_update.task is None and todo_update.completed is None:
+            continue
+        task, completed = changes.get(todo_update.id, (None, None))
+        if todo_update.task is not None:
+            task = todo_update.task
+        if todo_update.completed is not None:
+            completed = todo_update.completed
+        changes[todo_update.id] = (task, completed)
+
+    # Apply all changes in grouped statements
+    changed = list(changes.items())
+    for start in range(0, len(changed), TODO_BATCH_CHUNK_SIZE):
+        chunk = changed[start : start + TODO_BATCH_CHUNK_SIZE]
+        cursor.execute(
+            f"""
+            WITH v(id, task, completed) AS (
+                VALUES {", ".join(["(?, ?, ?)"] * len(chunk))}
+            )
+            UPDATE todos
+            SET task = coalesce(v.task, todos.task),
+                completed = coalesce(v.completed, todos.completed),
+                updatedAt = CURRENT_TIMESTAMP
+            FROM v
+            WHERE todos.id = v.id
+            RETURNING todos.id, todos.task, todos.completed
+        """,
+            [value for todo_id, change in chunk for value in (todo_id, *change)],
+        )
+        updated = cursor.fetchall()
+        if len(updated) != len(chunk):
+            # A todo was deleted between the existence check and the update
+            missing = {todo_id for todo_id, _ in chunk} - {row[0] for row in updated}
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Todo with id {min(missing)} not found",
+            )
+        rows.update((row[0], row) for row in updated)
+
+    return map_rows((rows[todo_update.id] for todo_update in todos), todo_row_to_dict)
 
 
 @router.put("/batch", response_model=List[Todo])
 async def update_todos_batch(todos: List[TodoBatchUpdate]):
     """Update multiple todos at once."""
-    with get_db() as db:
-        cursor = db.cursor()
-        updated_todos = []
-
-        for todo_update in todos:
-            # Check if todo exists
-            cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_update.id,))
-            existing_todo = cursor.fetchone()
-            if not existing_todo:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Todo with id {todo_update.id} not found",
-                )
-
-            # Update todo fields
-            updates = []
-            params = []
-            if todo_update.task is not None:
-                updates.append("task = ?")
-                params.append(todo_update.task)
-            if todo_update.completed is not None:
-                updates.append("completed = ?")
-                params.append(todo_update.completed)
-
-            if updates:
-                params.append(todo_update.id)
-                cursor.execute(
-                    f"UPDATE todos SET {', '.join(updates)} WHERE id = ?",
-                    params,
-                )
-
-            # Fetch updated todo
-            cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_update.id,))
-            updated_todo = cursor.fetchone()
-            updated_todos.append(
-                Todo(
-                    id=updated_todo[0], task=updated_todo[1], completed=updated_todo[2]
-                )
-            )
+    if len(todos) > TODO_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {TODO_BATCH_MAX_SIZE} todos",
+        )
+    updated_todos = await run_write(_update_todos_batch, todos)
+    todos_cache.invalidate(*(todo_update.id for todo_update in todos))
+    return json_response(updated_todos)
 
-        db.commit()
-        return updated_todos
+
+def _get_todos(
+    db,
+    limit: int,
+    after: Optional[str],
+    fields: List[str],
+    completed: Optional[bool] = None,
+):
+    """Load one page of todos with the selected fields, newest first."""
+    key = decode_cursor(after, (int,))
+    columns, to_dict = TODO_FIELDS.select(fields)
+    conditions, params = [], []
+    if completed is not None:
+        conditions.append("completed = ?")
+        params.append(completed)
+    if key:
+        conditions.append("id < ?")
+        params.extend(key)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = db.cursor()
+    cursor.execute(
+        f"SELECT {columns} FROM todos {where} ORDER BY id DESC LIMIT ?",
+        (*params, limit + 1),
+    )
+    todos, next_cursor = split_page(cursor.fetchall(), limit, lambda row: (row[0],))
+    return map_rows(todos, to_dict), next_cursor
 
 
 @router.get("/", response_model=List[Todo])
-async def get_todos():
-    """Get all todos."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM todos ORDER BY id DESC")
-        todos = cursor.fetchall()
-        return [Todo(id=todo[0], task=todo[1], completed=todo[2]) for todo in todos]
+async def get_todos(
+    request: Request,
+    limit: int = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    completed: Optional[bool] = Query(None, description="Only todos in this state"),
+    fields: Optional[str] = fields_query(TODO_FIELDS.fields),
+):
+    """Get a page of todos, newest first."""
+    page, validators = await run_db(
+        load_if_modified,
+        ("todos",),
+        conditional_headers(request),
+        _get_todos,
+        limit,
+        after,
+        TODO_FIELDS.parse(fields),
+        completed,
+        variant=query_variant(request),
+    )
+    if page is None:
+        return not_modified_response(validators)
+    todos, next_cursor = page
+    return json_response(
+        todos, headers={**page_headers(next_cursor), **validators.headers()}
+    )
+
+
+def _get_todo_stats(db):
+    """Read the trigger-maintained todo counters."""
+    total, completed = db.execute(
+        "SELECT total, completed FROM todo_counts WHERE id = 1"
+    ).fetchone()
+    return {"total": total, "completed": completed, "open": total - completed}
+
+
+@router.get("/stats", response_model=TodoStats)
+async def get_todo_stats(request: Request):
+    """Get the number of todos, completed and open."""
+    stats, validators = await run_db(
+        load_if_modified,
+        ("todos",),
+        conditional_headers(request),
+        _get_todo_stats,
+        variant=query_variant(request),
+    )
+    if stats is None:
+        return not_modified_response(validators)
+    return json_response(stats, headers=validators.headers())
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_todos():
+    """Stream every todo as newline-delimited JSON."""
+    rows = iter_rows("SELECT id, task, completed FROM todos ORDER BY id DESC")
+    return StreamingResponse(
+        iter_ndjson(rows, todo_row_to_dict), media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+def _get_todo(db, todo_id: int):
+    """Load one todo and its cache tag (none)."""
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT id, task, completed, updatedAt FROM todos WHERE id = ?", (todo_id,)
+    )
+    todo = cursor.fetchone()
+
+    if not todo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
+        )
+
+    return make_entity(todo_row_to_dict(todo), todo[3]), None
 
 
 @router.get("/{todo_id}", response_model=Todo)
-async def get_todo(todo_id: int):
+async def get_todo(todo_id: int, request: Request):
     """Get a specific todo by ID."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_id,))
-        todo = cursor.fetchone()
+    entity = await run_blocking(read_through, todos_cache, todo_id, _get_todo, todo_id)
+    return entity_response(request, entity)
 
-        if not todo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
-            )
 
-        return Todo(id=todo[0], task=todo[1], completed=todo[2])
+def _update_todo(db, todo_id: int, todo_update: TodoUpdate):
+    """Apply a partial update to a todo."""
+    cursor = db.cursor()
+
+    # Update todo fields
+    updates = []
+    params = []
+    if todo_update.task is not None:
+        updates.append("task = ?")
+        params.append(todo_update.task)
+    if todo_update.completed is not None:
+        updates.append("completed = ?")
+        params.append(todo_update.completed)
+
+    if updates:
+        params.append(todo_id)
+        cursor.execute(
+            f"UPDATE todos SET {', '.join(updates)}, updatedAt = CURRENT_TIMESTAMP "
+            "WHERE id = ? "
+            "RETURNING id, task, completed",
+            params,
+        )
+    else:
+        cursor.execute("SELECT id, task, completed FROM todos WHERE id = ?", (todo_id,))
+    todo = cursor.fetchone()
+    if not todo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
+        )
+
+    return todo_row_to_dict(todo)
 
 
 @router.put("/{todo_id}", response_model=Todo)
 async def update_todo(todo_id: int, todo_update: TodoUpdate):
     """Update a todo."""
-    with get_db() as db:
-        cursor = db.cursor()
+    todo = await run_write(_update_todo, todo_id, todo_update)
+    todos_cache.invalidate(todo_id)
+    return json_response(todo)
 
-        # Check if todo exists
-        cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_id,))
-        existing_todo = cursor.fetchone()
-        if not existing_todo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
-            )
-
-        # Update todo fields
-        updates = []
-        params = []
-        if todo_update.task is not None:
-            updates.append("task = ?")
-            params.append(todo_update.task)
-        if todo_update.completed is not None:
-            updates.append("completed = ?")
-            params.append(todo_update.completed)
-
-        if updates:
-            params.append(todo_id)
-            cursor.execute(
-                f"UPDATE todos SET {', '.join(updates)} WHERE id = ?",
-                params,
-            )
-            db.commit()
 
-            # Fetch updated todo
-            cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_id,))
-            updated_todo = cursor.fetchone()
-            return Todo(
-                id=updated_todo[0], task=updated_todo[1], completed=updated_todo[2]
-            )
+def _delete_todo(db, todo_id: int):
+    """Delete a todo."""
+    cursor = db.cursor()
 
-        return Todo(
-            id=existing_todo[0], task=existing_todo[1], completed=existing_todo[2]
+    # Check if todo exists
+    cursor.execute("SELECT id FROM todos WHERE id = ?", (todo_id,))
+    if not cursor.fetchone():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
         )
 
+    # Delete todo
+    cursor.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
+    return None
+
 
 @router.delete("/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(todo_id: int):
     """Delete a todo."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Check if todo exists
-        cursor.execute("SELECT id FROM todos WHERE id = ?", (todo_id,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found"
-            )
-
-        # Delete todo
-        cursor.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
-        db.commit()
-        return None
+    await run_write(_delete_todo, todo_id)
+    todos_cache.invalidate(todo_id)
+    return None
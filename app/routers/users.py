@@ -1,11 +1,30 @@
 """Router for user operations."""
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import List, Optional
+import sqlite3
 import uuid
 
-from app.database import get_db
-from app.models.user import User, UserCreate, UserUpdate
+from app.cache import posts_cache, read_through, users_cache
+from app.conditional import (
+    conditional_headers,
+    entity_response,
+    load_if_modified,
+    make_entity,
+    not_modified_response,
+    query_variant,
+)
+from app.database import run_blocking, run_db
+from app.writer import run_write
+from app.pagination import (
+    AfterQuery,
+    LimitQuery,
+    decode_cursor,
+    page_headers,
+    split_page,
+)
+from app.serialization import json_response, map_rows, user_row_to_dict
+from app.models.user import User, UserCreate, UserStats, UserUpdate
 
 router = APIRouter(
     prefix="/users",
@@ -14,136 +33,207 @@ router = APIRouter(
 )
 
 
+def _create_user(db, user: UserCreate):
+    """Insert a user with a fresh userId and return it."""
+    cursor = db.cursor()
+
+    # Create new user with UUID, relying on the UNIQUE email constraint
+    userId = str(uuid.uuid4())
+    try:
+        cursor.execute(
+            "INSERT INTO users (name, email, userId, updatedAt) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP) "
+            "RETURNING id, name, email, userId",
+            (user.name, user.email, userId),
+        )
+        user_data = cursor.fetchone()
+    except sqlite3.IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        ) from None
+
+    return user_row_to_dict(user_data)
+
+
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate):
     """Create a new user."""
-    with get_db() as db:
-        cursor = db.cursor()
+    return json_response(
+        await run_write(_create_user, user), status_code=status.HTTP_201_CREATED
+    )
 
-        # Check if email already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", (user.email,))
-        if cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered",
-            )
 
-        # Create new user with UUID
-        userId = str(uuid.uuid4())
+def _get_users(db, limit: int, after: Optional[str]):
+    """Load one page of users in creation order."""
+    key = decode_cursor(after, (int,))
+    cursor = db.cursor()
+    if key:
         cursor.execute(
-            "INSERT INTO users (name, email, userId) VALUES (?, ?, ?)",
-            (user.name, user.email, userId),
-        )
-        db.commit()
-
-        # Fetch the created user
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (userId,))
-        user_data = cursor.fetchone()
-        return User(
-            id=user_data[0], name=user_data[1], email=user_data[2], userId=user_data[3]
+            "SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?", (*key, limit + 1)
         )
+    else:
+        cursor.execute("SELECT * FROM users ORDER BY id LIMIT ?", (limit + 1,))
+    users, next_cursor = split_page(cursor.fetchall(), limit, lambda row: (row[0],))
+    return map_rows(users, user_row_to_dict), next_cursor
 
 
 @router.get("/", response_model=List[User])
-async def get_users():
-    """Get all users."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM users")
-        users = cursor.fetchall()
-        return [
-            User(id=user[0], name=user[1], email=user[2], userId=user[3])
-            for user in users
-        ]
+async def get_users(
+    request: Request,
+    limit: int = LimitQuery,
+    after: Optional[str] = AfterQuery,
+):
+    """Get a page of users in creation order."""
+    page, validators = await run_db(
+        load_if_modified,
+        ("users",),
+        conditional_headers(request),
+        _get_users,
+        limit,
+        after,
+        variant=query_variant(request),
+    )
+    if page is None:
+        return not_modified_response(validators)
+    users, next_cursor = page
+    return json_response(
+        users, headers={**page_headers(next_cursor), **validators.headers()}
+    )
+
+
+def _get_user(db, userId: str):
+    """Load one user by userId and its cache tag (none)."""
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT id, name, email, userId, updatedAt FROM users WHERE userId = ?",
+        (userId,),
+    )
+    user = cursor.fetchone()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    return make_entity(user_row_to_dict(user), user[4]), None
 
 
 @router.get("/{userId}", response_model=User)
-async def get_user(userId: str):
+async def get_user(userId: str, request: Request):
     """Get a specific user by userId."""
-    with get_db() as db:
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (userId,))
+    entity = await run_blocking(read_through, users_cache, userId, _get_user, userId)
+    return entity_response(request, entity)
+
+
+def _get_user_stats(db, userId: str):
+    """Read the trigger-maintained counters of a user."""
+    row = db.execute(
+        """
+        SELECT u.userId, coalesce(c.posts, 0)
+        FROM users u
+        LEFT JOIN user_post_counts c ON c.userId = u.userId
+        WHERE u.userId = ?
+    """,
+        (userId,),
+    ).fetchone()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return {"userId": row[0], "posts": row[1]}
+
+
+@router.get("/{userId}/stats", response_model=UserStats)
+async def get_user_stats(userId: str, request: Request):
+    """Get the number of posts written by a user."""
+    stats, validators = await run_db(
+        load_if_modified,
+        ("posts", "users"),
+        conditional_headers(request),
+        _get_user_stats,
+        userId,
+        variant=query_variant(request),
+    )
+    if stats is None:
+        return not_modified_response(validators)
+    return json_response(stats, headers=validators.headers())
+
+
+def _update_user(db, userId: str, user_update: UserUpdate):
+    """Apply a partial update to a user."""
+    cursor = db.cursor()
+
+    # Update user fields
+    update_fields = []
+    values = []
+    if user_update.name is not None:
+        update_fields.append("name = ?")
+        values.append(user_update.name)
+    if user_update.email is not None:
+        update_fields.append("email = ?")
+        values.append(user_update.email)
+
+    if update_fields:
+        values.append(userId)
+        try:
+            cursor.execute(
+                f"UPDATE users SET {', '.join(update_fields)}, "
+                "updatedAt = CURRENT_TIMESTAMP WHERE userId = ? "
+                "RETURNING id, name, email, userId",
+                values,
+            )
+            user = cursor.fetchone()
+        except sqlite3.IntegrityError:
+            # The new email belongs to another user
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            ) from None
+    else:
+        cursor.execute(
+            "SELECT id, name, email, userId FROM users WHERE userId = ?", (userId,)
+        )
         user = cursor.fetchone()
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
 
-        return User(id=user[0], name=user[1], email=user[2], userId=user[3])
+    return user_row_to_dict(user)
 
 
 @router.put("/{userId}", response_model=User)
 async def update_user(userId: str, user_update: UserUpdate):
     """Update a user's information."""
-    with get_db() as db:
-        cursor = db.cursor()
+    user = await run_write(_update_user, userId, user_update)
+    users_cache.invalidate(userId)
+    # Cached posts embed their author
+    posts_cache.invalidate_tag(userId)
+    return json_response(user)
 
-        # Check if user exists
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (userId,))
-        existing_user = cursor.fetchone()
-        if not existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
 
-        # Check if new email is already taken
-        if user_update.email and user_update.email != existing_user[2]:
-            cursor.execute("SELECT id FROM users WHERE email = ?", (user_update.email,))
-            if cursor.fetchone():
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered",
-                )
-
-        # Update user fields
-        update_fields = []
-        values = []
-        if user_update.name is not None:
-            update_fields.append("name = ?")
-            values.append(user_update.name)
-        if user_update.email is not None:
-            update_fields.append("email = ?")
-            values.append(user_update.email)
-
-        if not update_fields:
-            return User(
-                id=existing_user[0],
-                name=existing_user[1],
-                email=existing_user[2],
-                userId=existing_user[3],
-            )
+def _delete_user(db, userId: str):
+    """Delete a user."""
+    cursor = db.cursor()
 
-        values.append(userId)
-        query = f"UPDATE users SET {', '.join(update_fields)} WHERE userId = ?"
-        cursor.execute(query, values)
-        db.commit()
-
-        # Fetch updated user
-        cursor.execute("SELECT * FROM users WHERE userId = ?", (userId,))
-        updated_user = cursor.fetchone()
-        return User(
-            id=updated_user[0],
-            name=updated_user[1],
-            email=updated_user[2],
-            userId=updated_user[3],
+    # Check if user exists
+    cursor.execute("SELECT id FROM users WHERE userId = ?", (userId,))
+    if not cursor.fetchone():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
+    # Delete user
+    cursor.execute("DELETE FROM users WHERE userId = ?", (userId,))
+    return None
+
 
 @router.delete("/{userId}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(userId: str):
     """Delete a user."""
-    with get_db() as db:
-        cursor = db.cursor()
-
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE userId = ?", (userId,))
-        if not cursor.fetchone():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
-
-        # Delete user
-        cursor.execute("DELETE FROM users WHERE userId = ?", (userId,))
-        db.commit()
-        return None
+    await run_write(_delete_user, userId)
+    users_cache.invalidate(userId)
+    posts_cache.invalidate_tag(userId)
+    return None
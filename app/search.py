@@ -0,0 +1,113 @@
+"""Full-text search over posts with SQLite FTS5.
+
+The ``posts_fts`` index is created by migration 6 and kept in step with the
+``posts`` table by triggers. Results are ranked with BM25, title matches
+weighted above body matches, and paged with a ``(rank, id)`` cursor.
+
+Run ``python -m app.search rebuild`` to rebuild the index of a live database
+in short batches, e.g. after restoring ``posts`` from a backup.
+"""
+
+import html
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Optional
+
+from app.serialization import Row, post_row_to_dict
+
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+SEARCH_REBUILD_BATCH_SIZE = int(os.getenv("SEARCH_REBUILD_BATCH_SIZE", "1000"))
+
+# Control characters cannot appear in search terms, so they mark matches
+# unambiguously until the snippet has been HTML-escaped
+_OPEN, _CLOSE = "\x02", "\x03"
+
+SEARCH_COLUMNS = f"""
+    p.id, p.title, p.body, p.createdAt,
+    u.id as author_id, u.name as author_name, u.email as author_email, u.userId as author_userId,
+    f.rank, snippet(posts_fts, -1, '{_OPEN}', '{_CLOSE}', '…', {SEARCH_SNIPPET_TOKENS})
+"""
+
+
+def match_expression(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching every word.
+
+    Each word is quoted so FTS5 operators in user input are searched for
+    literally. A trailing ``*`` is kept as a prefix match.
+    """
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def highlight(snippet: str) -> str:
+    """HTML-escape a snippet and wrap its matches in ``<mark>``."""
+    return html.escape(snippet).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search_row_to_dict(row: Row) -> Dict[str, Any]:
+    """Map a search row to a PostSearchResult payload."""
+    result = post_row_to_dict(row)
+    result["snippet"] = highlight(row[9])
+    return result
+
+
+def search_key(row: Row):
+    """Sort key of a search row for cursor pagination."""
+    return (row[8], row[0])
+
+
+def rebuild_search_index(
+    conn: sqlite3.Connection, batch_size: int = SEARCH_REBUILD_BATCH_SIZE
+) -> int:
+    """Reindex every post in batches and return the number of posts indexed.
+
+    Each batch replaces one range of ids in its own short write transaction,
+    so readers and writers keep running between batches. Rows written while
+    the rebuild runs are indexed by the triggers.
+    """
+    end = conn.execute(
+        "SELECT max(coalesce((SELECT max(id) FROM posts), 0), "
+        "coalesce((SELECT max(rowid) FROM posts_fts), 0))"
+    ).fetchone()[0]
+    last, indexed = 0, 0
+    while last < end:
+        upper = conn.execute(
+            "SELECT max(id) FROM (SELECT id FROM posts WHERE id > ? ORDER BY id LIMIT ?)",
+            (last, batch_size),
+        ).fetchone()[0]
+        if upper is None:
+            upper = end
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM posts_fts WHERE rowid > ? AND rowid <= ?", (last, upper)
+            )
+            indexed += conn.execute(
+                "INSERT INTO posts_fts (rowid, title, body) "
+                "SELECT id, title, body FROM posts WHERE id > ? AND id <= ?",
+                (last, upper),
+            ).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        last = upper
+
+    return indexed
+
+
+if __name__ == "__main__":
+    from app.database import get_db, init_db
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.search rebuild")
+    init_db()
+    with get_db() as db:
+        print(f"Reindexed {rebuild_search_index(db)} posts")
@@ -0,0 +1,159 @@
+"""Row mapping and JSON encoding for API responses.
+
+Rows read from our own tables are already valid, so they are mapped straight
+to plain dicts shaped like the response models and encoded with
+pydantic-core, skipping model construction and validation.
+"""
+
+import itertools
+import os
+import sqlite3
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from fastapi import Response, status
+from pydantic_core import to_json
+
+from app.database import (
+    InstrumentedConnection,
+    StreamingCursor,
+    acquire_export_slot,
+    get_pool,
+)
+from app.metrics import encode_duration, map_duration, timed
+
+# Rows fetched per round-trip when streaming large result sets
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "500"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+Row = Sequence[Any]
+
+
+def format_timestamp(value: Any) -> Any:
+    """Render a SQLite ``CURRENT_TIMESTAMP`` value as ISO 8601."""
+    if isinstance(value, str):
+        return value.replace(" ", "T", 1)
+    return value
+
+
+def to_sql_timestamp(value: datetime) -> str:
+    """Render a datetime the way SQLite's ``CURRENT_TIMESTAMP`` stores it."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def user_row_to_dict(row: Row, offset: int = 0) -> Dict[str, Any]:
+    """Map ``id, name, email, userId`` columns to a User payload."""
+    return {
+        "id": row[offset],
+        "name": row[offset + 1],
+        "email": row[offset + 2],
+        "userId": row[offset + 3],
+    }
+
+
+def post_row_to_dict(row: Row) -> Dict[str, Any]:
+    """Map ``id, title, body, createdAt`` plus author columns to a PostResponse payload."""
+    return {
+        "id": row[0],
+        "title": row[1],
+        "body": row[2],
+        "createdAt": format_timestamp(row[3]),
+        "author": user_row_to_dict(row, 4),
+    }
+
+
+def todo_row_to_dict(row: Row) -> Dict[str, Any]:
+    """Map ``id, task, completed`` columns to a Todo payload."""
+    return {"id": row[0], "task": row[1], "completed": bool(row[2])}
+
+
+def map_rows(
+    rows: Iterable[Row], to_dict: Callable[[Row], Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Map result rows to response payloads, timed as the ``map`` phase."""
+    with timed("map", map_duration):
+        return [to_dict(row) for row in rows]
+
+
+def json_response(
+    payload: Any,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Encode an already-shaped payload straight to a JSON response.
+
+    Returning a ``Response`` makes FastAPI skip ``response_model`` validation,
+    which stays on the route for the OpenAPI schema only. ``bytes`` payloads
+    are taken as already-encoded JSON.
+    """
+    if not isinstance(payload, bytes):
+        with timed("encode", encode_duration):
+            payload = to_json(payload)
+    return Response(
+        content=payload,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def iter_rows(
+    query: str, params: Sequence[Any] = (), size: int = EXPORT_FETCH_SIZE
+) -> Iterator[sqlite3.Row]:
+    """Yield query results in ``fetchmany`` batches from a dedicated connection.
+
+    A slow client can hold an export open for a long time, so exports never
+    take pooled connections. Instead each one takes an export slot up front,
+    raising ``ExportLimitReached`` (answered with 503) when all are in use,
+    and opens its own connection once streaming starts. The slot is freed
+    when the rows are exhausted or the generator is discarded.
+    """
+    release = acquire_export_slot()
+    rows = _read_rows(release, query, params, size)
+    # Also covers a response that is dropped before it starts streaming
+    weakref.finalize(rows, release)
+    return rows
+
+
+def _read_rows(
+    release: Callable[[], None], query: str, params: Sequence[Any], size: int
+) -> Iterator[sqlite3.Row]:
+    """Read an export on its own connection, then free its slot."""
+    try:
+        db = get_pool().connect()
+        try:
+            if isinstance(db, InstrumentedConnection):
+                cursor = db.cursor(StreamingCursor)
+            else:
+                cursor = db.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            db.close()
+    finally:
+        release()
+
+
+def iter_ndjson(
+    rows: Iterable[Row],
+    to_dict: Callable[[Row], Dict[str, Any]],
+    size: int = EXPORT_FETCH_SIZE,
+) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON, one chunk per ``size`` rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        payloads = map_rows(batch, to_dict)
+        with timed("encode", encode_duration):
+            chunk = b"".join(to_json(payload) + b"\n" for payload in payloads)
+        yield chunk
@@ -0,0 +1,280 @@
+"""Write path: per-request commits or a single group-commit writer.
+
+Write helpers take a connection and never commit; ``run_write`` owns the
+transaction. In the default ``direct`` mode each write runs on the database
+executor and commits on its own. With ``DB_WRITE_MODE=group`` writes are
+queued to one writer thread that runs up to ``DB_GROUP_COMMIT_MAX_BATCH`` of
+them in a single transaction, each inside its own savepoint, and commits
+once. A failing write only rolls back its savepoint. Callers are resumed
+after the shared ``COMMIT`` returns, and the writer connection runs with
+``synchronous=FULL`` so that commit is durable, at the cost of one fsync
+per batch instead of one per request.
+
+In both modes a write that has not started within ``DB_WRITE_TIMEOUT``
+seconds is dropped and the caller gets :class:`WriteTimeout`. A write that
+has started is always waited for, so a timeout never hides a commit.
+"""
+
+import asyncio
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from app.database import (
+    InstrumentedConnection,
+    PoolTimeout,
+    apply_pragmas,
+    get_pool,
+    submit_db,
+)
+from app.metrics import gauge, histogram
+
+DB_WRITE_MODE = os.getenv("DB_WRITE_MODE", "direct")
+DB_GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", "64"))
+# How long the writer waits for more writes after the first one of a batch
+DB_GROUP_COMMIT_INTERVAL_MS = float(os.getenv("DB_GROUP_COMMIT_INTERVAL_MS", "2"))
+DB_GROUP_COMMIT_SYNCHRONOUS = os.getenv("DB_GROUP_COMMIT_SYNCHRONOUS", "FULL")
+# How long a write may wait to start before it is dropped; 0 waits forever
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "5.0"))
+
+T = TypeVar("T")
+
+group_commit_size = histogram(
+    "db_group_commit_size",
+    "Writes committed together by the group-commit writer.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+group_commit_duration = histogram(
+    "db_group_commit_seconds",
+    "Time to run and commit one group-commit batch.",
+)
+
+
+class WriteTimeout(PoolTimeout):
+    """Raised when a write could not start within ``DB_WRITE_TIMEOUT``."""
+
+
+class _Job:
+    """A queued write and the future of its result."""
+
+    __slots__ = ("context", "fn", "args", "kwargs", "future")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: Dict[str, Any]):
+        self.context = contextvars.copy_context()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+
+class GroupCommitWriter:
+    """A dedicated thread and connection that commits writes in batches."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        pragmas: Dict[str, Any],
+        max_batch: int = DB_GROUP_COMMIT_MAX_BATCH,
+        interval: float = DB_GROUP_COMMIT_INTERVAL_MS / 1000,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.db_path = Path(db_path)
+        self.pragmas = {**pragmas, "synchronous": DB_GROUP_COMMIT_SYNCHRONOUS}
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # Why the writer stopped on its own, if it did
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Writes waiting for the writer."""
+        return self._queue.qsize()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future:
+        """Queue ``fn(conn, *args, **kwargs)`` and return its future."""
+        job = _Job(fn, args, kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Writer is closed") from self.error
+            self._queue.put(job)
+        return job.future
+
+    def close(self) -> None:
+        """Finish queued writes and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            factory=InstrumentedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        # Transactions are managed explicitly around each batch
+        conn.isolation_level = None
+        return conn
+
+    def _collect(self, first: _Job) -> List[Optional[_Job]]:
+        """Gather writes arriving shortly after ``first`` into one batch."""
+        batch: List[Optional[_Job]] = [first]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                job = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else (self._queue.get_nowait())
+                )
+            except queue.Empty:
+                break
+            batch.append(job)
+            if job is None:
+                break
+        return batch
+
+    def _fail(self, error: BaseException) -> None:
+        """Stop accepting writes and fail every queued one with ``error``."""
+        with self._lock:
+            self._closed = True
+            self.error = error
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None and job.future.set_running_or_notify_cancel():
+                job.future.set_exception(error)
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except Exception as exc:
+            self._fail(exc)
+            return
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch = self._collect(first)
+                self._commit(conn, [job for job in batch if job is not None])
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[_Job]) -> None:
+        """Run a batch in one transaction and resolve its futures."""
+        start = time.perf_counter()
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not jobs:
+            return
+
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                conn.execute("SAVEPOINT write")
+                try:
+                    result = job.context.run(job.fn, conn, *job.args, **job.kwargs)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((job, None, exc))
+                else:
+                    conn.execute("RELEASE write")
+                    outcomes.append((job, result, None))
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            # The transaction as a whole failed: nothing in it was committed
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            outcomes = [(job, None, exc) for job in jobs]
+
+        group_commit_size.observe(len(jobs))
+        group_commit_duration.observe(time.perf_counter() - start)
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> GroupCommitWriter:
+    """Get the process-wide group-commit writer, starting it on first use."""
+    global _writer
+    if _writer is None or _writer.error is not None:
+        with _writer_lock:
+            # A writer that could not open its connection is replaced
+            if _writer is None or _writer.error is not None:
+                pool = get_pool()
+                _writer = GroupCommitWriter(pool.db_path, pool.pragmas)
+    return _writer
+
+
+def close_writer() -> None:
+    """Flush and stop the group-commit writer, if it was started."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+gauge(
+    "db_write_queue_depth",
+    "Writes waiting for the group-commit writer.",
+    lambda: {(): _writer.depth} if _writer is not None else {},
+)
+
+
+def _call_and_commit(db, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a write helper and commit its transaction."""
+    result = fn(db, *args, **kwargs)
+    db.commit()
+    return result
+
+
+async def run_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run the write helper ``fn(db, *args, **kwargs)`` and commit it.
+
+    Returns once the write is committed, directly or as part of a group.
+    Raises :class:`WriteTimeout` if it cannot start within
+    ``DB_WRITE_TIMEOUT`` seconds.
+    """
+    if DB_WRITE_MODE == "group":
+        future = get_writer().submit(fn, *args, **kwargs)
+    else:
+        future = submit_db(_call_and_commit, fn, *args, **kwargs)
+    waiter = asyncio.wrap_future(future)
+    done, _ = await asyncio.wait({waiter}, timeout=DB_WRITE_TIMEOUT or None)
+    # Only a write that has not started yet can be dropped
+    if not done and future.cancel():
+        raise WriteTimeout("Write did not start in time")
+    return await waiter
@@ -0,0 +1,90 @@
+"""Compare two load test results and flag regressions.
+
+Both files are written by ``benchmarks.load --output``. An endpoint regresses
+when its p95 latency grows, or its throughput drops, by more than
+``--threshold`` percent; the exit status is 1 if any endpoint does:
+
+    python -m benchmarks.compare results/base.json results/head.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base", type=Path, help="results to compare against")
+    parser.add_argument("head", type=Path, help="results of the change")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="allowed change in percent"
+    )
+    return parser.parse_args()
+
+
+def change(base: float, head: float) -> Optional[float]:
+    """Relative change from ``base`` to ``head`` in percent."""
+    if not base:
+        return None
+    return (head - base) / base * 100
+
+
+def format_change(value: Optional[float]) -> str:
+    """Render a change, or ``n/a`` when there is no baseline."""
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+
+def compare(base: Dict, head: Dict, threshold: float) -> List[str]:
+    """Print a table of both runs and return the regressed endpoints."""
+    for label, report in (("base", base), ("head", head)):
+        meta = report["meta"]
+        print(
+            f"{label}: {meta['revision']} at {meta['timestamp']}, "
+            f"scale {meta['scale']}, concurrency {meta['concurrency']}"
+        )
+    if base["meta"]["scale"] != head["meta"]["scale"]:
+        print("warning: the runs used databases of different sizes")
+    print()
+    print(
+        f"{'endpoint':<20} {'p95 base':>9} {'p95 head':>9} {'change':>8} "
+        f"{'rps base':>9} {'rps head':>9} {'change':>8}"
+    )
+
+    regressions = []
+    for name, before in base["results"].items():
+        after = head["results"].get(name)
+        if after is None:
+            print(f"{name:<20} missing from head")
+            continue
+        latency = change(before["p95_ms"], after["p95_ms"])
+        throughput = change(before["rps"], after["rps"])
+        regressed = (latency is not None and latency > threshold) or (
+            throughput is not None and throughput < -threshold
+        )
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<20} {before['p95_ms']:>9.2f} {after['p95_ms']:>9.2f} "
+            f"{format_change(latency):>8} {before['rps']:>9.1f} {after['rps']:>9.1f} "
+            f"{format_change(throughput):>8}" + ("  REGRESSED" if regressed else "")
+        )
+    return regressions
+
+
+def main():
+    args = parse_args()
+    base = json.loads(args.base.read_text())
+    head = json.loads(args.head.read_text())
+    regressions = compare(base, head, args.threshold)
+    if regressions:
+        print(
+            f"\n{len(regressions)} endpoint(s) regressed by more than {args.threshold}%"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure how request throughput scales with concurrent clients.
+
+Runs the real application in-process over an ASGI transport against a
+temporary database, so nothing but Python and the app dependencies are needed:
+
+    python -m benchmarks.concurrency --posts 2000 --levels 1,4,16,64
+
+Set ``--max-concurrency`` to compare different ``DB_MAX_CONCURRENCY`` limits.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1000, help="posts to seed")
+    parser.add_argument(
+        "--levels", default="1,2,4,8,16,32", help="comma separated client counts"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="seconds per concurrency level"
+    )
+    parser.add_argument("--path", default="/posts/", help="endpoint to request")
+    parser.add_argument(
+        "--max-concurrency", type=int, help="override DB_MAX_CONCURRENCY"
+    )
+    parser.add_argument(
+        "--database", help="scratch database to seed (default: a temporary file)"
+    )
+    return parser.parse_args()
+
+
+def seed(posts: int) -> None:
+    """Fill the benchmark database with one user and ``posts`` posts."""
+    from app.database import get_db, init_db
+
+    init_db()
+    with get_db() as db:
+        db.execute(
+            "INSERT INTO users (name, email, userId) VALUES (?, ?, ?)",
+            ("Bench User", "bench@example.com", "bench-user"),
+        )
+        db.executemany(
+            "INSERT INTO posts (title, body, userId) VALUES (?, ?, ?)",
+            ((f"Post {i}", "lorem ipsum " * 20, "bench-user") for i in range(posts)),
+        )
+        db.commit()
+
+
+async def run_level(app, path: str, clients: int, duration: float):
+    """Hammer ``path`` with ``clients`` concurrent clients for ``duration``."""
+    import httpx
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+
+    async def client_loop(client):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return len(latencies) / elapsed, statistics.median(latencies)
+
+
+def main():
+    args = parse_args()
+    # Never fall back to DATABASE_PATH: the benchmark writes to the database
+    os.environ["DATABASE_PATH"] = args.database or str(
+        Path(tempfile.mkdtemp(prefix="bench-")) / "bench.db"
+    )
+    if args.max_concurrency:
+        os.environ["DB_MAX_CONCURRENCY"] = str(args.max_concurrency)
+
+    seed(args.posts)
+    from app.main import app
+
+    print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10}")
+    for clients in (int(level) for level in args.levels.split(",")):
+        rps, p50 = asyncio.run(run_level(app, args.path, clients, args.duration))
+        print(f"{clients:>8} {rps:>10.1f} {p50 * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
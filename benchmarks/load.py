@@ -0,0 +1,279 @@
+"""Measure latency and throughput of the API endpoints on a seeded database.
+
+Each endpoint is driven on its own by ``--concurrency`` clients for
+``--duration`` seconds after a short warmup. Requests pick random ids and
+users from the seeded ranges so caches see a realistic spread. The app runs
+in-process over an ASGI transport, or pass ``--url`` to drive a server that
+is already running against the same database. Write endpoints change the
+data, so they only run when named with ``--endpoints``:
+
+    python -m benchmarks.seed --database bench.db --users 1000 --posts 100000
+    python -m benchmarks.load --database bench.db --output results/head.json
+    python -m benchmarks.compare results/base.json results/head.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from benchmarks.seed import WORDS, user_id
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scale(NamedTuple):
+    """Row counts of the seeded tables, read before the run."""
+
+    users: int
+    posts: int
+    todos: int
+
+
+class Endpoint(NamedTuple):
+    """A named request; ``path`` builds a URL for each request."""
+
+    name: str
+    method: str
+    path: Callable[[random.Random, Scale], str]
+    body: Optional[Callable[[random.Random], dict]] = None
+
+
+ENDPOINTS: Sequence[Endpoint] = (
+    Endpoint("posts.list", "GET", lambda rng, scale: "/posts/?limit=20"),
+    Endpoint(
+        "posts.list_authors",
+        "GET",
+        lambda rng, scale: "/posts/?limit=20&include=authors",
+    ),
+    Endpoint(
+        "posts.get",
+        "GET",
+        lambda rng, scale: f"/posts/{rng.randint(1, scale.posts)}",
+    ),
+    Endpoint(
+        "posts.by_user",
+        "GET",
+        lambda rng, scale: f"/posts/user/{user_id(rng.randrange(scale.users))}",
+    ),
+    Endpoint(
+        "posts.search",
+        "GET",
+        lambda rng, scale: f"/posts/search?q={rng.choice(WORDS)}+{rng.choice(WORDS)}",
+    ),
+    Endpoint(
+        "users.get",
+        "GET",
+        lambda rng, scale: f"/users/{user_id(rng.randrange(scale.users))}",
+    ),
+    Endpoint(
+        "users.stats",
+        "GET",
+        lambda rng, scale: f"/users/{user_id(rng.randrange(scale.users))}/stats",
+    ),
+    Endpoint("todos.list", "GET", lambda rng, scale: "/todos/?completed=false"),
+    Endpoint("todos.stats", "GET", lambda rng, scale: "/todos/stats"),
+    Endpoint(
+        "todos.create",
+        "POST",
+        lambda rng, scale: "/todos/",
+        lambda rng: {"task": f"Bench {rng.random()}"},
+    ),
+)
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="bench.db", help="seeded database")
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument(
+        "--endpoints",
+        help="comma separated endpoint names, default all reads: "
+        + ", ".join(endpoint.name for endpoint in ENDPOINTS),
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="seconds per endpoint"
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=1.0, help="unmeasured seconds per endpoint"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    return parser.parse_args()
+
+
+def read_scale(path: Path) -> Scale:
+    """Count the seeded rows without going through the app."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        users, posts, todos = (
+            conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            for table in ("users", "posts", "todos")
+        )
+    finally:
+        conn.close()
+    if not users or not posts:
+        raise SystemExit(f"{path} has no users or posts, run benchmarks.seed first")
+    return Scale(users, posts, todos)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """The ``p``-th percentile of sorted ``values`` by nearest rank."""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Requests per second and latency percentiles in milliseconds."""
+    latencies = sorted(latencies)
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3)
+        if latencies
+        else 0.0,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(latencies, p) * 1000, 3)
+    summary["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else 0.0
+    return summary
+
+
+async def drive(
+    client, endpoint: Endpoint, scale: Scale, args, rng: random.Random
+) -> Dict:
+    """Run one endpoint through its warmup and measured phases."""
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(deadline: float, measure: bool):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            path = endpoint.path(rng, scale)
+            body = endpoint.body(rng) if endpoint.body else None
+            start = time.perf_counter()
+            response = await client.request(endpoint.method, path, json=body)
+            elapsed = time.perf_counter() - start
+            if not measure:
+                continue
+            # 304 and 404 are answers too; only count server-side failures
+            if response.status_code >= 500:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    for duration, measure in ((args.warmup, False), (args.duration, True)):
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            *(worker(deadline, measure) for _ in range(args.concurrency))
+        )
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run(endpoints: Sequence[Endpoint], scale: Scale, args) -> Dict[str, Dict]:
+    """Drive every endpoint in turn and collect its summary."""
+    import httpx
+
+    rng = random.Random(args.seed)
+    results = {}
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(
+                base_url=args.url,
+                limits=httpx.Limits(max_connections=args.concurrency),
+                timeout=30,
+            )
+        else:
+            from app.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                base_url="http://bench",
+            )
+        await stack.enter_async_context(client)
+
+        for endpoint in endpoints:
+            results[endpoint.name] = summary = await drive(
+                client, endpoint, scale, args, rng
+            )
+            print(
+                f"{endpoint.name:<20} {summary['rps']:>9.1f} "
+                + " ".join(f"{summary[f'p{p}_ms']:>9.2f}" for p in PERCENTILES)
+                + f" {summary['errors']:>7}"
+            )
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """The checked-out commit, marked dirty if the tree has changes."""
+    try:
+        revision = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision or None
+
+
+def main():
+    args = parse_args()
+    path = Path(args.database)
+    scale = read_scale(path)
+    selected = [endpoint for endpoint in ENDPOINTS if endpoint.method == "GET"]
+    if args.endpoints:
+        names = args.endpoints.split(",")
+        unknown = set(names) - {endpoint.name for endpoint in ENDPOINTS}
+        if unknown:
+            raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        selected = [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+
+    if not args.url:
+        os.environ["DATABASE_PATH"] = str(path)
+
+    print(
+        f"{'endpoint':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    )
+    results = asyncio.run(run(selected, scale, args))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": args.url or "in-process",
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+            "scale": scale._asdict(),
+        },
+        "results": results,
+    }
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
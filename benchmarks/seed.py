@@ -0,0 +1,156 @@
+"""Fill a database with synthetic users, posts and todos for load tests.
+
+The data is generated from a fixed random seed, so two runs at the same scale
+produce the same database and results can be compared between commits:
+
+    python -m benchmarks.seed --database bench.db --users 100000 --posts 1000000
+
+Rows go through the normal schema, so the search index, counters and table
+versions are maintained by the same triggers as in production.
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor whiskey "
+    "xray yankee zulu sqlite python fastapi async index cache query latency "
+    "throughput cursor search page stream batch commit snapshot replica"
+).split()
+
+# Posts are spread over this period, ending at the fixed point below
+SPAN = timedelta(days=365)
+END = datetime(2026, 1, 1)
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="bench.db", help="database file")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--todos", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument(
+        "--batch-size", type=int, default=10000, help="rows per transaction"
+    )
+    parser.add_argument(
+        "--replace", action="store_true", help="delete an existing database first"
+    )
+    return parser.parse_args()
+
+
+def user_id(i: int) -> str:
+    """The userId of the ``i``-th seeded user."""
+    return f"user-{i}"
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    """A string of ``words`` random words."""
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def users(count: int) -> Iterator[Tuple[str, str, str]]:
+    """Rows for the users table."""
+    for i in range(count):
+        yield (f"User {i}", f"user{i}@example.com", user_id(i))
+
+
+def posts(rng: random.Random, count: int, user_count: int) -> Iterator[tuple]:
+    """Rows for the posts table, oldest first and skewed towards a few users."""
+    step = SPAN / max(count, 1)
+    start = END - SPAN
+    for i in range(count):
+        # Squaring a uniform draw gives the low ids most of the posts
+        author = int(rng.random() ** 2 * user_count)
+        yield (
+            sentence(rng, rng.randint(3, 8)).capitalize(),
+            sentence(rng, rng.randint(20, 80)),
+            user_id(author),
+            (start + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+
+def todos(rng: random.Random, count: int) -> Iterator[Tuple[str, bool]]:
+    """Rows for the todos table, about a third of them completed."""
+    for _ in range(count):
+        yield (sentence(rng, rng.randint(2, 6)).capitalize(), rng.random() < 0.3)
+
+
+def insert(db, sql: str, rows: Iterable[tuple], batch_size: int) -> int:
+    """Insert ``rows`` in transactions of ``batch_size`` and return the count."""
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return total
+        db.executemany(sql, batch)
+        db.commit()
+        total += len(batch)
+
+
+def seed(
+    users_count: int,
+    posts_count: int,
+    todos_count: int,
+    seed: int = 42,
+    batch_size: int = 10000,
+) -> None:
+    """Populate the configured database at the given scale."""
+    from app.database import get_db, init_db
+
+    if posts_count and not users_count:
+        raise ValueError("Posts need at least one user")
+    rng = random.Random(seed)
+    init_db()
+    with get_db() as db:
+        for table, sql, rows in (
+            (
+                "users",
+                "INSERT INTO users (name, email, userId) VALUES (?, ?, ?)",
+                users(users_count),
+            ),
+            (
+                "posts",
+                "INSERT INTO posts (title, body, userId, createdAt) VALUES (?, ?, ?, ?)",
+                posts(rng, posts_count, users_count),
+            ),
+            (
+                "todos",
+                "INSERT INTO todos (task, completed) VALUES (?, ?)",
+                todos(rng, todos_count),
+            ),
+        ):
+            start = time.perf_counter()
+            count = insert(db, sql, rows, batch_size)
+            print(f"{table:>6}: {count} rows in {time.perf_counter() - start:.1f}s")
+        db.execute("ANALYZE")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.commit()
+
+
+def main():
+    args = parse_args()
+    path = Path(args.database)
+    if path.exists():
+        if not args.replace:
+            raise SystemExit(f"{path} exists, pass --replace to overwrite it")
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    os.environ["DATABASE_PATH"] = str(path)
+    # Bulk inserts are expected to be slow; don't log each one
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+    seed(args.users, args.posts, args.todos, args.seed, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the per-row cost of serializing post listings.
+
+The model path is what ``get_posts`` used to do: build a ``PostResponse`` and
+nested ``User`` per row, then let ``response_model`` validate and encode the
+list again. The fast path maps rows to dicts and encodes them once:
+
+    python -m benchmarks.serialization --rows 1000 --repeat 20
+"""
+
+import argparse
+import timeit
+from typing import List
+
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from app.models.post import PostResponse
+from app.models.user import User
+from app.serialization import post_row_to_dict
+
+
+def make_rows(count: int):
+    """Build rows shaped like the posts-with-author query."""
+    return [
+        (
+            i,
+            f"Post {i}",
+            "lorem ipsum " * 20,
+            "2024-03-26 12:00:00",
+            i % 100,
+            f"User {i % 100}",
+            f"user{i % 100}@example.com",
+            f"user-{i % 100}",
+        )
+        for i in range(count)
+    ]
+
+
+posts_adapter = TypeAdapter(List[PostResponse])
+
+
+def model_path(rows) -> bytes:
+    """Build models per row, then re-validate and encode as response_model does."""
+    posts = [
+        PostResponse(
+            id=post[0],
+            title=post[1],
+            body=post[2],
+            createdAt=post[3],
+            author=User(id=post[4], name=post[5], email=post[6], userId=post[7]),
+        )
+        for post in rows
+    ]
+    return posts_adapter.dump_json(posts_adapter.validate_python(posts))
+
+
+def fast_path(rows) -> bytes:
+    """Map rows to dicts and encode them once."""
+    return to_json([post_row_to_dict(post) for post in rows])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"{'path':>8} {'us/row':>10}")
+    for name, fn in (("model", model_path), ("fast", fast_path)):
+        best = min(timeit.repeat(lambda: fn(rows), number=1, repeat=args.repeat))
+        print(f"{name:>8} {best / args.rows * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Show how PUT /todos/batch scales with batch size.
+
+Compares the set-based ``_update_todos_batch`` against the previous
+per-item loop (SELECT, UPDATE, SELECT for every todo) on a temporary
+database:
+
+    python -m benchmarks.todo_batch --sizes 10,100,1000,5000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def per_item_update(db, todos):
+    """The previous N+1 implementation, kept here as the baseline."""
+    cursor = db.cursor()
+    updated = []
+    for todo_update in todos:
+        cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_update.id,))
+        if not cursor.fetchone():
+            raise LookupError(todo_update.id)
+        updates, params = [], []
+        if todo_update.task is not None:
+            updates.append("task = ?")
+            params.append(todo_update.task)
+        if todo_update.completed is not None:
+            updates.append("completed = ?")
+            params.append(todo_update.completed)
+        if updates:
+            params.append(todo_update.id)
+            cursor.execute(
+                f"UPDATE todos SET {', '.join(updates)} WHERE id = ?", params
+            )
+        cursor.execute("SELECT * FROM todos WHERE id = ?", (todo_update.id,))
+        updated.append(cursor.fetchone())
+    db.commit()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--database", help="scratch database to fill (default: a temporary file)"
+    )
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    # Never fall back to DATABASE_PATH: the benchmark rewrites every todo
+    os.environ["DATABASE_PATH"] = args.database or str(
+        Path(tempfile.mkdtemp(prefix="bench-")) / "bench.db"
+    )
+    from app.database import get_db, init_db
+    from app.models.todo import TodoBatchUpdate
+    from app.routers.todos import _update_todos_batch
+    from app.writer import _call_and_commit
+
+    def set_based_update(db, todos):
+        """The set-based helper, committed as ``run_write`` would."""
+        return _call_and_commit(db, _update_todos_batch, todos)
+
+    init_db()
+    with get_db() as db:
+        db.executemany(
+            "INSERT INTO todos (task) VALUES (?)",
+            ((f"Todo {i}",) for i in range(max(sizes))),
+        )
+        db.commit()
+        ids = [row[0] for row in db.execute("SELECT id FROM todos ORDER BY id")]
+
+    print(f"{'size':>8} {'per-item ms':>12} {'set-based ms':>13} {'speedup':>8}")
+    for size in sizes:
+        batch = [
+            TodoBatchUpdate(id=todo_id, completed=i % 2 == 0, task=f"Updated {i}")
+            for i, todo_id in enumerate(ids[:size])
+        ]
+        timings = []
+        for fn in (per_item_update, set_based_update):
+            best = float("inf")
+            for _ in range(args.repeat):
+                with get_db() as db:
+                    start = time.perf_counter()
+                    fn(db, batch)
+                    best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        print(
+            f"{size:>8} {timings[0] * 1000:>12.2f} {timings[1] * 1000:>13.2f} "
+            f"{timings[0] / timings[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
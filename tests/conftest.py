@@ -1,12 +1,29 @@
 """Test configuration and fixtures."""
 
+import os
+import tempfile
+from pathlib import Path
+
 import pytest
 from fastapi.testclient import TestClient
 
-from app.main import app
+# Point the app at a throwaway database before it is imported
+os.environ.setdefault(
+    "DATABASE_PATH", str(Path(tempfile.mkdtemp(prefix="fastapi-demo-")) / "test.db")
+)
+
+from app.database import init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the schema for tests that use the database without a client."""
+    init_db()
 
 
 @pytest.fixture
 def client():
-    """Create a test client."""
-    return TestClient(app)
+    """Create a test client that runs the app's startup and shutdown."""
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,166 @@
+"""Tests for admission control."""
+
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.middleware.admission import (
+    AdmissionMiddleware,
+    TokenBuckets,
+    admission_rejections,
+)
+
+
+def make_app(**options):
+    """Build a small app whose writes block until released."""
+    app = FastAPI()
+    app.state.release = None
+
+    @app.get("/items")
+    async def read_items():
+        return []
+
+    @app.post("/items")
+    async def write_item():
+        await app.state.release.wait()
+        return {}
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    app.add_middleware(AdmissionMiddleware, **options)
+    return app
+
+
+def run(app, scenario):
+    """Run ``scenario(client)`` against ``app`` on a fresh event loop."""
+
+    async def main():
+        app.state.release = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await scenario(c)
+
+    return asyncio.run(main())
+
+
+def test_token_buckets():
+    """Test that a bucket allows a burst and then refills at its rate."""
+    buckets = TokenBuckets(rate=2, burst=2, max_clients=10)
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 0.5
+    assert buckets.take("b", now=0) == 0
+    assert buckets.take("a", now=0.5) == 0
+
+
+def test_token_buckets_forget_idle_clients():
+    """Test that the number of tracked clients is bounded."""
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2)
+    for key in "abc":
+        buckets.take(key, now=0)
+    assert buckets.take("a", now=0) == 0
+
+
+def test_rate_limit_per_client():
+    """Test that a client over its rate gets 429 with Retry-After."""
+    app = make_app(rate=1, burst=2, client_header="X-Forwarded-For")
+    before = admission_rejections.value("read", "rate_limited")
+
+    async def scenario(client):
+        first = [await client.get("/items", headers={"X-Forwarded-For": "1.1.1.1"})]
+        # A spoofed left-most entry does not make a new client
+        first += [
+            await client.get("/items", headers={"X-Forwarded-For": "9.9.9.9, 1.1.1.1"})
+        ]
+        limited = await client.get(
+            "/items", headers={"X-Forwarded-For": "8.8.8.8, 1.1.1.1"}
+        )
+        other = await client.get("/items", headers={"X-Forwarded-For": "2.2.2.2"})
+        health = await client.get("/healthz", headers={"X-Forwarded-For": "1.1.1.1"})
+        return first, limited, other, health
+
+    first, limited, other, health = run(app, scenario)
+    assert [response.status_code for response in first] == [200, 200]
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "1"
+    assert limited.json() == {"detail": "Too many requests"}
+    assert other.status_code == 200
+    assert health.status_code == 200
+    assert admission_rejections.value("read", "rate_limited") == before + 1
+
+
+def test_client_key_trusted_hops():
+    """Test that the key skips the entries appended by trusted proxies."""
+    middleware = AdmissionMiddleware(
+        None, client_header="X-Forwarded-For", trusted_hops=2
+    )
+
+    def key(*values):
+        headers = [(b"x-forwarded-for", value.encode()) for value in values]
+        return middleware.client_key({"headers": headers, "client": ("10.0.0.9", 1)})
+
+    assert key("6.6.6.6, 1.1.1.1, 10.0.0.1") == "1.1.1.1"
+    assert key("6.6.6.6, 1.1.1.1", "10.0.0.1") == "1.1.1.1"
+    assert key("1.1.1.1") == "1.1.1.1"
+    assert key() == "10.0.0.9"
+
+
+def test_write_limit_sheds_excess_writes():
+    """Test that writes over the cap get 503 while reads still pass."""
+    app = make_app(max_writes=1, queue_timeout=0, retry_after=3)
+    before = admission_rejections.value("write", "overloaded")
+
+    async def scenario(client):
+        held = asyncio.create_task(client.post("/items"))
+        await asyncio.sleep(0.05)
+        shed = await client.post("/items")
+        read = await client.get("/items")
+        app.state.release.set()
+        return await held, shed, read
+
+    held, shed, read = run(app, scenario)
+    assert held.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "3"
+    assert read.status_code == 200
+    assert admission_rejections.value("write", "overloaded") == before + 1
+
+
+def test_queued_write_gets_freed_slot():
+    """Test that a request waiting within the timeout is admitted."""
+    app = make_app(max_writes=1, queue_timeout=5)
+
+    async def scenario(client):
+        held = asyncio.create_task(client.post("/items"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(client.post("/items"))
+        await asyncio.sleep(0.05)
+        app.state.release.set()
+        return await held, await queued
+
+    held, queued = run(app, scenario)
+    assert held.status_code == 200
+    assert queued.status_code == 200
+
+
+def test_limits_off_by_default(client):
+    """Test that the app admits everything unless configured."""
+    responses = [client.get("/todos/") for _ in range(20)]
+    assert all(response.status_code == 200 for response in responses)
+
+
+def test_rejections_carry_cors_headers(client, monkeypatch):
+    """Test that CORS wraps admission control so browsers can read a 429."""
+    middleware = client.app.middleware_stack
+    while not isinstance(middleware, AdmissionMiddleware):
+        middleware = middleware.app
+    monkeypatch.setattr(middleware, "buckets", TokenBuckets(1, 1, 10))
+
+    origin = {"Origin": "http://example.com"}
+    assert client.get("/todos/", headers=origin).status_code == 200
+    response = client.get("/todos/", headers=origin)
+    assert response.status_code == 429
+    assert "access-control-allow-origin" in response.headers
@@ -0,0 +1,222 @@
+"""Tests for the entity cache."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from app.cache import (
+    CACHES,
+    LRUCache,
+    coherence,
+    posts_cache,
+    sync_caches,
+    todos_cache,
+    users_cache,
+)
+from app.database import get_db, get_pool
+
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    """Clean up cached entities and rows after each test."""
+    yield
+    for cache in CACHES:
+        cache.clear()
+    with get_db() as db:
+        db.execute("DELETE FROM posts")
+        db.execute("DELETE FROM users")
+        db.commit()
+
+
+def test_evicts_least_recently_used():
+    """Test that the entry limit evicts the least recently used key."""
+    cache = LRUCache("test", max_entries=2, max_bytes=0, ttl=0)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.evictions == 1
+
+
+def test_byte_limit():
+    """Test that the byte limit is enforced across entries."""
+    cache = LRUCache("test", max_entries=100, max_bytes=10, ttl=0)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"12345")
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 10
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+
+
+def test_ttl_expiry(monkeypatch):
+    """Test that entries expire after the TTL."""
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache("test", max_entries=10, max_bytes=0, ttl=5)
+    cache.set("a", b"1")
+    assert cache.get("a") == b"1"
+    now[0] += 5
+    assert cache.get("a") is None
+
+
+def test_invalidate_tag():
+    """Test that tag invalidation drops only tagged entries."""
+    cache = LRUCache("test", max_entries=10, max_bytes=0, ttl=0)
+    cache.set(1, b"a", tag="alice")
+    cache.set(2, b"b", tag="bob")
+    cache.set(3, b"c", tag="alice")
+    cache.invalidate_tag("alice")
+    assert cache.get(1) is None and cache.get(3) is None
+    assert cache.get(2) == b"b"
+
+
+def test_stale_read_is_not_cached():
+    """Test that a value read before an invalidation is discarded."""
+    cache = LRUCache("test", max_entries=10, max_bytes=0, ttl=0)
+    token = cache.begin_read()
+    cache.invalidate(1)
+    cache.set(1, b"stale", token=token)
+    assert cache.get(1) is None
+
+
+def test_get_user_is_cached_and_invalidated(client):
+    """Test read-through caching and invalidation on update."""
+    user = client.post(
+        "/users/", json={"name": "Cached", "email": "cached@example.com"}
+    ).json()
+
+    client.get(f"/users/{user['userId']}")
+    hits = users_cache.hits
+    assert client.get(f"/users/{user['userId']}").json() == user
+    assert users_cache.hits == hits + 1
+
+    client.put(f"/users/{user['userId']}", json={"name": "Renamed"})
+    assert client.get(f"/users/{user['userId']}").json()["name"] == "Renamed"
+
+
+def test_user_update_invalidates_cached_posts(client):
+    """Test that cached posts do not keep a stale author."""
+    user = client.post(
+        "/users/", json={"name": "Author", "email": "author@example.com"}
+    ).json()
+    post = client.post(
+        "/posts/", json={"title": "T", "body": "B", "userId": user["userId"]}
+    ).json()
+    client.get(f"/posts/{post['id']}")
+    assert len(posts_cache) == 1
+
+    client.put(f"/users/{user['userId']}", json={"name": "New Name"})
+    assert client.get(f"/posts/{post['id']}").json()["author"]["name"] == "New Name"
+
+
+def test_deleted_post_is_not_served_from_cache(client):
+    """Test that deleting a post evicts it."""
+    user = client.post(
+        "/users/", json={"name": "Author", "email": "author@example.com"}
+    ).json()
+    post = client.post(
+        "/posts/", json={"title": "T", "body": "B", "userId": user["userId"]}
+    ).json()
+    client.get(f"/posts/{post['id']}")
+
+    assert client.delete(f"/posts/{post['id']}").status_code == 204
+    assert client.get(f"/posts/{post['id']}").status_code == 404
+
+
+def test_cache_stats_endpoint(client):
+    """Test that counters are exposed."""
+    data = client.get("/admin/cache").json()
+    assert set(data) == {"users", "posts", "todos", "compressed"}
+    assert {"hits", "misses", "evictions", "entries", "bytes"} <= set(data["users"])
+
+
+def write_from_other_process(sql, params=()):
+    """Commit a change through a connection outside the pool, like another worker."""
+    conn = sqlite3.connect(get_pool().db_path)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_change_from_other_worker_invalidates_user(client):
+    """Test that a write on another connection is not masked by the cache."""
+    user = client.post(
+        "/users/", json={"name": "Before", "email": "shared@example.com"}
+    ).json()
+    assert client.get(f"/users/{user['userId']}").json()["name"] == "Before"
+    assert len(users_cache) == 1
+
+    write_from_other_process(
+        "UPDATE users SET name = 'After' WHERE userId = ?", (user["userId"],)
+    )
+    assert client.get(f"/users/{user['userId']}").json()["name"] == "After"
+
+
+def test_change_from_other_worker_invalidates_posts_by_author(client):
+    """Test that an author change elsewhere evicts their cached posts."""
+    user = client.post(
+        "/users/", json={"name": "Before", "email": "shared@example.com"}
+    ).json()
+    post = client.post(
+        "/posts/", json={"title": "T", "body": "B", "userId": user["userId"]}
+    ).json()
+    client.get(f"/posts/{post['id']}")
+
+    write_from_other_process(
+        "UPDATE users SET name = 'After' WHERE userId = ?", (user["userId"],)
+    )
+    assert client.get(f"/posts/{post['id']}").json()["author"]["name"] == "After"
+
+
+def test_unrelated_change_keeps_other_entries(client):
+    """Test that only the affected keys are dropped."""
+    first = client.post("/todos/", json={"task": "First"}).json()
+    second = client.post("/todos/", json={"task": "Second"}).json()
+    client.get(f"/todos/{first['id']}")
+    client.get(f"/todos/{second['id']}")
+
+    write_from_other_process(
+        "UPDATE todos SET task = 'Changed' WHERE id = ?", (first["id"],)
+    )
+    assert sync_caches()
+    assert todos_cache.get(first["id"]) is None
+    assert todos_cache.get(second["id"]) is not None
+    client.delete(f"/todos/{first['id']}")
+    client.delete(f"/todos/{second['id']}")
+
+
+def test_coherence_check_runs_off_event_loop(client, monkeypatch):
+    """Test that cached reads check coherence on the database executor."""
+    todo = client.post("/todos/", json={"task": "Threaded"}).json()
+    threads = []
+    check = coherence.check
+
+    def record():
+        threads.append(threading.current_thread().name)
+        return check()
+
+    monkeypatch.setattr(coherence, "check", record)
+    assert client.get(f"/todos/{todo['id']}").status_code == 200
+    assert client.get(f"/todos/{todo['id']}").status_code == 200
+    assert len(threads) == 2
+    assert all(name.startswith("db") for name in threads)
+    client.delete(f"/todos/{todo['id']}")
+
+
+def test_cache_stats_in_metrics(client):
+    """Test that cache counters are exported at /metrics."""
+    todo = client.post("/todos/", json={"task": "Counted"}).json()
+    client.get(f"/todos/{todo['id']}")
+    client.get(f"/todos/{todo['id']}")
+    text = client.get("/metrics").text
+    assert f'cache_hits{{cache="todos"}} {todos_cache.hits}' in text
+    assert f'cache_entries{{cache="todos"}} {len(todos_cache)}' in text
+    assert 'cache_bytes{cache="compressed"}' in text
+    client.delete(f"/todos/{todo['id']}")
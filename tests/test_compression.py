@@ -0,0 +1,115 @@
+"""Tests for response compression."""
+
+import gzip
+
+import pytest
+
+from app.database import get_db
+from app.middleware.compression import (
+    available_encoders,
+    choose_encoding,
+    compressed_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    """Clean up todos and compressed bodies after each test."""
+    yield
+    compressed_cache.clear()
+    with get_db() as db:
+        db.execute("DELETE FROM todos")
+        db.commit()
+
+
+def create_todos(client, count=50):
+    """Create enough todos for the listing to pass the size threshold."""
+    client.post(
+        "/todos/batch",
+        json={"todos": [{"task": f"Task number {i}"} for i in range(count)]},
+    )
+
+
+def test_choose_encoding():
+    """Test Accept-Encoding negotiation with q-values and server preference."""
+    preference = ["br", "zstd", "gzip"]
+    assert choose_encoding("gzip, br", preference) == "br"
+    assert choose_encoding("gzip;q=1, br;q=0.5", preference) == "gzip"
+    assert choose_encoding("br;q=0, gzip", preference) == "gzip"
+    assert choose_encoding("*", preference) == "br"
+    assert choose_encoding("identity", preference) is None
+    assert choose_encoding("", preference) is None
+
+
+def test_large_response_is_gzipped(client):
+    """Test that a large listing is compressed and decodes to the same JSON."""
+    create_todos(client)
+    plain = client.get("/todos/", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+
+    response = client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(plain.content)
+    assert response.json() == plain.json()
+
+
+def test_uncompressed_response_varies_by_accept_encoding(client):
+    """Test that shared caches can tell plain and compressed copies apart."""
+    create_todos(client)
+    response = client.get("/todos/", headers={"Accept-Encoding": ""})
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(response.json()) == 50
+
+    response = client.get(
+        "/todos/",
+        headers={"Accept-Encoding": "", "If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_small_response_is_not_compressed(client):
+    """Test that bodies below the threshold are sent as is."""
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_compressed_body_cached_by_etag(client):
+    """Test that polling an unchanged listing reuses the compressed body."""
+    create_todos(client)
+    client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+    hits = compressed_cache.hits
+    response = client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+    assert compressed_cache.hits == hits + 1
+    assert len(response.json()) == 50
+
+    # A write changes the ETag, so the old body is not served
+    create_todos(client, count=1)
+    response = client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+    assert len(response.json()) == 51
+
+
+def test_streaming_export_is_compressed(client):
+    """Test that NDJSON exports are compressed chunk by chunk."""
+    create_todos(client)
+    with client.stream(
+        "GET", "/todos/export", headers={"Accept-Encoding": "gzip"}
+    ) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert len(gzip.decompress(raw).splitlines()) == 50
+
+
+@pytest.mark.skipif("zstd" not in available_encoders(), reason="zstd unavailable")
+def test_zstd_when_available(client):
+    """Test that zstd is negotiated when a zstd module is installed."""
+    create_todos(client)
+    response = client.get("/todos/", headers={"Accept-Encoding": "zstd"})
+    assert response.headers["Content-Encoding"] == "zstd"
+    encoder = available_encoders()["zstd"]
+    plain = client.get("/todos/", headers={"Accept-Encoding": "identity"}).content
+    assert len(encoder.compress(plain)) < len(plain)
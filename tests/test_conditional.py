@@ -0,0 +1,168 @@
+"""Tests for conditional GETs with ETag and Last-Modified."""
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from app.cache import CACHES
+from app.conditional import Validators, is_not_modified
+from app.database import get_db
+
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    """Clean up cached entities and rows after each test."""
+    yield
+    for cache in CACHES:
+        cache.clear()
+    with get_db() as db:
+        db.execute("DELETE FROM posts")
+        db.execute("DELETE FROM users")
+        db.execute("DELETE FROM todos")
+        db.commit()
+
+
+def test_weak_etag_comparison():
+    """Test If-None-Match matching against weak and strong tags."""
+    validators = Validators('W/"abc"')
+    assert is_not_modified('"abc"', None, validators)
+    assert is_not_modified('W/"x", W/"abc"', None, validators)
+    assert is_not_modified("*", None, validators)
+    assert not is_not_modified('W/"abd"', None, validators)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    """Test that If-Modified-Since is ignored alongside If-None-Match."""
+    validators = Validators('W/"abc"', "Tue, 01 Jan 2030 00:00:00 GMT")
+    assert not is_not_modified('W/"other"', "Wed, 01 Jan 2031 00:00:00 GMT", validators)
+    assert not is_not_modified(None, "garbage", validators)
+
+
+def later(monkeypatch, seconds: float = 2) -> None:
+    """Move the clock used to judge Last-Modified forward."""
+    now = time.time() + seconds
+    monkeypatch.setattr("app.conditional.time.time", lambda: now)
+
+
+def test_collection_not_modified(client, monkeypatch):
+    """Test that an unchanged todo listing answers 304 without a body."""
+    client.post("/todos/", json={"task": "Cache me"})
+    later(monkeypatch)
+    response = client.get("/todos/")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert "Last-Modified" in response.headers
+
+    response = client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_collection_etag_changes_on_write(client):
+    """Test that any write to the table changes the listing ETag."""
+    todo = client.post("/todos/", json={"task": "Before"}).json()
+    etag = client.get("/todos/").headers["ETag"]
+
+    client.put(f"/todos/{todo['id']}", json={"completed": True})
+    response = client.get("/todos/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["completed"] is True
+
+
+def test_posts_etag_follows_authors(client):
+    """Test that renaming an author changes the posts listing ETag."""
+    user = client.post(
+        "/users/", json={"name": "Author", "email": "etag@example.com"}
+    ).json()
+    client.post("/posts/", json={"title": "T", "body": "B", "userId": user["userId"]})
+    etag = client.get("/posts/").headers["ETag"]
+    assert client.get("/posts/", headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/users/{user['userId']}", json={"name": "Renamed"})
+    response = client.get("/posts/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["author"]["name"] == "Renamed"
+
+
+def test_entity_not_modified(client, monkeypatch):
+    """Test single-entity 304s by ETag and by If-Modified-Since."""
+    todo = client.post("/todos/", json={"task": "One"}).json()
+    later(monkeypatch)
+    response = client.get(f"/todos/{todo['id']}")
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(f"/todos/{todo['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get(
+        f"/todos/{todo['id']}", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+    response = client.get(
+        f"/todos/{todo['id']}",
+        headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"},
+    )
+    assert response.status_code == 200
+    assert response.json()["task"] == "One"
+
+
+def test_entity_etag_changes_on_update(client):
+    """Test that an updated entity no longer matches its old ETag."""
+    user = client.post(
+        "/users/", json={"name": "Before", "email": "entity@example.com"}
+    ).json()
+    etag = client.get(f"/users/{user['userId']}").headers["ETag"]
+
+    client.put(f"/users/{user['userId']}", json={"name": "After"})
+    response = client.get(f"/users/{user['userId']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "After"
+
+
+def test_same_second_write_is_not_hidden(client, monkeypatch):
+    """Test that If-Modified-Since is not honored within a write's second."""
+    client.post("/todos/", json={"task": "First"})
+    response = client.get("/todos/")
+    assert "Last-Modified" not in response.headers
+
+    # A client holding a date from this second must not get a 304 after a
+    # second write in the same second
+    since = formatdate(time.time() + 1, usegmt=True)
+    client.post("/todos/", json={"task": "Second"})
+    response = client.get("/todos/", headers={"If-Modified-Since": since})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    later(monkeypatch)
+    response = client.get("/todos/")
+    last_modified = response.headers["Last-Modified"]
+    response = client.get("/todos/", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+
+def test_listing_etag_depends_on_query(client):
+    """Test that an ETag only revalidates the representation it came from."""
+    user = client.post(
+        "/users/", json={"name": "Author", "email": "variant@example.com"}
+    ).json()
+    client.post("/posts/", json={"title": "T", "body": "B", "userId": user["userId"]})
+    etag = client.get("/posts/", params={"fields": "id"}).headers["ETag"]
+
+    response = client.get("/posts/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "T"
+    for params in ({"include": "authors"}, {"limit": 1}):
+        response = client.get("/posts/", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+    # The same parameters in another order are the same representation
+    etag = client.get("/posts/", params={"fields": "id,title", "limit": 5}).headers[
+        "ETag"
+    ]
+    response = client.get(
+        "/posts/?limit=5&fields=id,title", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
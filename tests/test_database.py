@@ -0,0 +1,253 @@
+"""Tests for the database layer."""
+
+import logging
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import app.database
+from app.database import (
+    ConnectionPool,
+    PoolTimeout,
+    StreamingCursor,
+    get_db,
+    get_pool,
+    get_pragmas,
+    read_pragmas,
+    redact_params,
+    set_pool,
+    slow_queries,
+)
+from app.migrations import migrate
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Create an isolated connection pool."""
+    pool = ConnectionPool(tmp_path / "pool.db", max_size=2, timeout=0.05)
+    yield pool
+    pool.close()
+
+
+def test_pool_reuses_connections(pool):
+    """Test that released connections are handed out again."""
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool.size == 1
+
+
+def test_pool_is_bounded(pool):
+    """Test that the pool never opens more than max_size connections."""
+    first = pool.acquire()
+    second = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.size == 2
+    assert pool.idle == 2
+
+
+def test_pool_hands_connections_across_threads(pool):
+    """Test that a connection opened in one thread can be used in another."""
+    conn = pool.acquire()
+    pool.release(conn)
+    results = []
+
+    def worker():
+        with pool.connection() as db:
+            results.append(db.execute("SELECT 1").fetchone()[0])
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert results == [1]
+
+
+def test_pool_rolls_back_on_release(pool):
+    """Test that uncommitted work does not leak into the next checkout."""
+    with pool.connection() as db:
+        db.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        db.commit()
+        db.execute("INSERT INTO items DEFAULT VALUES")
+        assert db.in_transaction
+
+    with pool.connection() as db:
+        assert not db.in_transaction
+        assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_closed_pool_rejects_checkout(pool):
+    """Test that a closed pool refuses new checkouts."""
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_release_after_close_discards_connection(pool):
+    """Test that a connection returned after close() is closed, not pooled."""
+    conn = pool.acquire()
+    pool.close()
+    pool.release(conn)
+    assert pool.idle == 0
+    assert pool.size == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+
+def test_pool_exhaustion_returns_503(client, pool):
+    """Test that requests shed with 503 when no connection frees up."""
+    with pool.connection() as db:
+        migrate(db)
+    previous = set_pool(pool)
+    try:
+        held = [pool.acquire(), pool.acquire()]
+        response = client.get("/todos/")
+        for conn in held:
+            pool.release(conn)
+    finally:
+        set_pool(previous)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_set_pool_swaps_get_db(pool):
+    """Test that get_db uses whichever pool is installed."""
+    previous = set_pool(pool)
+    try:
+        assert get_pool() is pool
+        with get_db() as db:
+            assert db.execute("PRAGMA database_list").fetchone()[2].endswith("pool.db")
+    finally:
+        set_pool(previous)
+
+
+def test_production_profile_is_applied(tmp_path):
+    """Test that every pooled connection gets the production PRAGMAs."""
+    pool = ConnectionPool(tmp_path / "tuned.db", pragmas=get_pragmas("production"))
+    try:
+        with pool.connection() as db:
+            settings = read_pragmas(db)
+    finally:
+        pool.close()
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1  # NORMAL
+    assert settings["temp_store"] == 2  # MEMORY
+    assert settings["cache_size"] == -65536
+    assert settings["busy_timeout"] == 5000
+
+
+def test_pragma_override_from_environment(monkeypatch):
+    """Test that DB_PRAGMA_* variables override profile values."""
+    monkeypatch.setenv("DB_PRAGMA_CACHE_SIZE", "-2000")
+    assert get_pragmas("production")["cache_size"] == "-2000"
+
+
+def test_unknown_profile_is_rejected():
+    """Test that a misspelled profile fails loudly."""
+    with pytest.raises(ValueError):
+        get_pragmas("prod")
+
+
+def test_database_settings_endpoint(client):
+    """Test that the active settings can be inspected over HTTP."""
+    response = client.get("/admin/database")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["profile"] == "default"
+    assert data["pragmas"]["busy_timeout"] == 5000
+
+
+@pytest.fixture
+def log_every_query(monkeypatch):
+    """Treat every statement as slow."""
+    monkeypatch.setattr(app.database, "DB_SLOW_QUERY_MS", 1e-9)
+    slow_queries.clear()
+    yield
+    slow_queries.clear()
+
+
+def test_redact_params():
+    """Test that parameter values never reach the slow-query log."""
+    assert redact_params(("secret@example.com", 42, None, b"xy")) == [
+        "<str:18>",
+        "<int>",
+        None,
+        "<bytes:2>",
+    ]
+    assert redact_params({"email": "a@b"}) == {"email": "<str:3>"}
+
+
+def test_slow_query_logged_with_plan(pool, log_every_query, caplog):
+    """Test that slow statements are logged, explained and ranked."""
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+        with caplog.at_level(logging.WARNING, logger="app.database"):
+            conn.execute("SELECT * FROM t WHERE name = ?", ("hidden",)).fetchall()
+
+    assert "Slow query" in caplog.text
+    assert "hidden" not in caplog.text
+    entry = next(
+        e for e in slow_queries.top() if e["statement"].startswith("SELECT * FROM t")
+    )
+    assert entry["count"] == 1
+    assert entry["lastParams"] == ["<str:6>"]
+    assert any("SCAN t" in step for step in entry["plan"])
+
+
+def test_slow_queries_keyed_by_full_statement(pool, log_every_query):
+    """Test that long statements sharing a prefix are logged apart."""
+    columns = ", ".join(f"c{i}" for i in range(60))
+    with pool.connection() as conn:
+        conn.execute(f"CREATE TABLE wide (id INTEGER PRIMARY KEY, {columns})")
+        conn.execute("CREATE INDEX wide_c0 ON wide (c0)")
+        conn.execute(f"SELECT {columns} FROM wide WHERE c0 = ?", (1,)).fetchall()
+        conn.execute(f"SELECT {columns} FROM wide WHERE c1 = ?", (1,)).fetchall()
+
+    entries = [e for e in slow_queries.top() if "FROM wide" in e["statement"]]
+    assert len(entries) == 2
+    plans = {e["statement"][-6:]: " ".join(e["plan"]) for e in entries}
+    assert "USING INDEX wide_c0" in plans["c0 = ?"]
+    assert "SCAN wide" in plans["c1 = ?"]
+
+
+def test_streaming_cursor_times_only_execute(pool, monkeypatch):
+    """Test that slowly read export rows are not reported as slow queries."""
+    monkeypatch.setattr(app.database, "DB_SLOW_QUERY_MS", 50)
+    slow_queries.clear()
+    with pool.connection() as conn:
+        for factory in (StreamingCursor, app.database.InstrumentedCursor):
+            cursor = conn.cursor(factory)
+            cursor.execute(f"SELECT '{factory.__name__}'")
+            # A fetch that took a second, as when the client reads slowly
+            cursor._fetched(time.perf_counter() - 1, 1)
+    assert [entry["statement"] for entry in slow_queries.top()] == [
+        "SELECT 'InstrumentedCursor'"
+    ]
+    slow_queries.clear()
+
+
+def test_slow_query_top_n_keeps_slowest():
+    """Test that a full log only admits statements slower than its fastest."""
+    log = app.database.SlowQueryLog(size=2)
+    log.record("a", 0.3, [])
+    log.record("b", 0.1, [])
+    log.record("c", 0.05, [])
+    log.record("d", 0.2, [])
+    assert [entry["statement"] for entry in log.top()] == ["a", "d"]
+
+
+def test_slow_queries_endpoint(client, log_every_query):
+    """Test that recorded statements are served and can be cleared."""
+    client.get("/todos/")
+    data = client.get("/admin/slow-queries").json()
+    assert data["queries"]
+    assert {"statement", "count", "maxMs", "plan", "lastParams"} <= set(
+        data["queries"][0]
+    )
+    assert client.delete("/admin/slow-queries").status_code == 204
@@ -0,0 +1,125 @@
+"""Tests for the liveness and readiness probes."""
+
+import sqlite3
+
+import pytest
+
+import app.health
+from app.database import ConnectionPool, get_db, get_pool, set_pool
+from app.health import ReadinessProbe, probe, readiness
+
+
+@pytest.fixture(autouse=True)
+def fresh_probe():
+    """Make every test run its own probe."""
+    readiness.reset()
+    yield
+    readiness.reset()
+
+
+def test_healthz(client):
+    """Test that liveness answers without checking anything."""
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz(client):
+    """Test that a migrated database with free space is ready."""
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert set(data["checks"]) == {"database", "schema", "wal", "disk"}
+    assert all(check["status"] == "ok" for check in data["checks"].values())
+
+
+def test_readyz_is_cached(client, monkeypatch):
+    """Test that repeated probes within the TTL reuse one result."""
+    calls = []
+
+    def counting_probe(path):
+        calls.append(path)
+        return probe(path)
+
+    monkeypatch.setattr(app.health, "probe", counting_probe)
+    for _ in range(5):
+        assert client.get("/readyz").status_code == 200
+    assert len(calls) == 1
+
+
+def test_readyz_degraded_when_schema_is_behind(client):
+    """Test that a schema mismatch drains traffic with 503 and Retry-After."""
+    with get_db() as db:
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        db.execute("PRAGMA user_version = 1")
+    try:
+        response = client.get("/readyz")
+    finally:
+        with get_db() as db:
+            db.execute(f"PRAGMA user_version = {version}")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    data = response.json()
+    assert data["status"] == "degraded"
+    assert data["checks"]["schema"] == {
+        "status": "fail",
+        "version": 1,
+        "expected": version,
+    }
+
+
+def test_readyz_degraded_when_database_is_locked(client, monkeypatch):
+    """Test that a held write lock fails the probe instead of hanging."""
+    monkeypatch.setattr(app.health, "HEALTH_LOCK_TIMEOUT_MS", 50)
+    holder = sqlite3.connect(get_pool().db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        response = client.get("/readyz")
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+    assert response.status_code == 503
+    assert response.json()["checks"]["database"]["status"] == "fail"
+
+
+def test_readyz_degraded_when_disk_is_low(client, monkeypatch):
+    """Test that low free space fails the probe before writes do."""
+    monkeypatch.setattr(app.health, "HEALTH_MIN_FREE_MB", 1024**4)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["disk"]["status"] == "fail"
+
+
+def test_probe_missing_database(tmp_path):
+    """Test that the probe never creates the database it checks."""
+    path = tmp_path / "missing.db"
+    result = probe(path)
+    assert result["status"] == "degraded"
+    assert result["checks"]["database"]["status"] == "fail"
+    assert not path.exists()
+
+
+def test_probe_reports_wal_lag(tmp_path, monkeypatch):
+    """Test that frames a reader keeps from being checkpointed count as lag."""
+    pool = ConnectionPool(tmp_path / "wal.db", pragmas={"journal_mode": "WAL"})
+    previous = set_pool(pool)
+    try:
+        with pool.connection() as db:
+            db.execute("CREATE TABLE t (v)")
+            db.commit()
+        reader = sqlite3.connect(pool.db_path)
+        reader.execute("BEGIN")
+        reader.execute("SELECT count(*) FROM t").fetchone()
+        with pool.connection() as db:
+            db.executemany("INSERT INTO t VALUES (?)", ((i,) for i in range(100)))
+            db.commit()
+
+        monkeypatch.setattr(app.health, "HEALTH_MAX_WAL_FRAMES", 0)
+        result = ReadinessProbe(lambda: pool.db_path, ttl=0).check()
+        reader.close()
+    finally:
+        set_pool(previous)
+        pool.close()
+    assert result["checks"]["wal"]["pendingFrames"] > 0
+    assert result["checks"]["wal"]["status"] == "fail"
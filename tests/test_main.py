@@ -1,5 +1,23 @@
 """Tests for the main application."""
 
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import (
+    ConnectionPool,
+    close_pool,
+    get_pool,
+    init_db,
+    set_pool,
+)
+from app.main import app
+from app.migrations import LATEST_VERSION, get_schema_version
+
 
 def test_read_root(client):
     """Test the root endpoint returns correct response."""
@@ -9,3 +27,104 @@ def test_read_root(client):
     assert "message" in data
     assert "version" in data
     assert data["version"] == "1.0.0"
+
+
+def test_import_does_not_touch_database(tmp_path):
+    """Test that importing the app leaves the database alone."""
+    path = tmp_path / "untouched.db"
+    subprocess.run(
+        [sys.executable, "-c", "import app.main"],
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        env={**os.environ, "DATABASE_PATH": str(path)},
+    )
+    assert not path.exists()
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        ({"ENVIRONMENT": "development"}, 200),
+        ({"ENVIRONMENT": "production"}, 404),
+        ({"ENVIRONMENT": "production", "ADMIN_ENABLED": "true"}, 200),
+        ({"ENVIRONMENT": "development", "ADMIN_ENABLED": "false"}, 404),
+    ],
+)
+def test_admin_routes_gated(tmp_path, env, expected):
+    """Test that /admin is only served in development unless enabled."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from fastapi.testclient import TestClient; from app.main import app; "
+            "print(TestClient(app).get('/admin/cache').status_code)",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+        env={
+            **{k: v for k, v in os.environ.items() if k != "ADMIN_ENABLED"},
+            "DATABASE_PATH": str(tmp_path / "admin.db"),
+            **env,
+        },
+    )
+    assert result.stdout.strip().splitlines()[-1] == str(expected)
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        ({"ENVIRONMENT": "development"}, True),
+        ({"ENVIRONMENT": "production"}, False),
+        ({"ENVIRONMENT": "production", "SERVER_TIMING": "true"}, True),
+    ],
+)
+def test_server_timing_gated(tmp_path, env, expected):
+    """Test that Server-Timing is only sent in development unless enabled."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from fastapi.testclient import TestClient; from app.main import app; "
+            "print('server-timing' in TestClient(app).get('/healthz').headers)",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+        env={
+            **{k: v for k, v in os.environ.items() if k != "SERVER_TIMING"},
+            "DATABASE_PATH": str(tmp_path / "timing.db"),
+            **env,
+        },
+    )
+    assert result.stdout.strip().splitlines()[-1] == str(expected)
+
+
+def test_lifespan_migrates_and_warms_pool(tmp_path):
+    """Test that startup prepares a fresh database and shutdown closes it."""
+    pool = ConnectionPool(tmp_path / "fresh.db", max_size=3)
+    set_pool(pool)
+    with TestClient(app) as client:
+        assert client.get("/todos/").json() == []
+        assert pool.size == 3
+        with pool.connection() as conn:
+            assert get_schema_version(conn) == LATEST_VERSION
+    assert pool.size == 0
+    assert get_pool() is not pool
+    assert (tmp_path / "fresh.db.lock").exists()
+
+
+def test_init_db_skips_lock_when_current(tmp_path, monkeypatch):
+    """Test that workers starting on a migrated database don't queue."""
+    set_pool(ConnectionPool(tmp_path / "current.db"))
+    try:
+        init_db()
+        monkeypatch.setattr(
+            "app.database.file_lock",
+            lambda path: pytest.fail("lock taken for a current schema"),
+        )
+        init_db()
+    finally:
+        close_pool()
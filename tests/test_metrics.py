@@ -0,0 +1,81 @@
+"""Tests for request and query metrics."""
+
+import pytest
+
+from app.database import get_db
+from app.metrics import Histogram, db_rows, normalize_sql, sql_label
+
+
+@pytest.fixture(autouse=True)
+def cleanup_todos():
+    """Clean up todos after each test."""
+    yield
+    with get_db() as db:
+        db.execute("DELETE FROM todos")
+        db.commit()
+
+
+def test_normalize_sql_bounds_batch_statements():
+    """Test that statements differing only in batch size share a label."""
+    one = normalize_sql("INSERT INTO t (a, b) VALUES (?, ?)")
+    many = normalize_sql("INSERT INTO t (a, b)\n  VALUES (?, ?), (?, ?), (?, ?)")
+    assert one == "INSERT INTO t (a, b) VALUES (?...)"
+    assert many == "INSERT INTO t (a, b) VALUES (?...), ..."
+    assert normalize_sql("SELECT id FROM t WHERE id IN (?, ?, ?)") == (
+        "SELECT id FROM t WHERE id IN (?...)"
+    )
+
+
+def test_histogram_exposition():
+    """Test cumulative buckets, sum and count in the text format."""
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP demo_seconds Demo.", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_metrics_endpoint_reports_routes_and_queries(client):
+    """Test that requests and their SQL show up at /metrics."""
+    client.post("/todos/", json={"task": "Measure me"})
+    client.get("/todos/1")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/todos/{todo_id}"'
+        in text
+    )
+    assert 'db_statement_duration_seconds_count{statement="INSERT INTO todos' in text
+    assert "db_pool_wait_seconds_count" in text
+    assert 'db_pool_connections{state="open"}' in text
+
+
+def test_rows_are_counted(client):
+    """Test that fetched rows are counted per statement."""
+    client.post("/todos/batch", json={"todos": [{"task": "a"}, {"task": "b"}]})
+    # The listing selects the cursor key ahead of the requested fields
+    statement = sql_label(
+        normalize_sql(
+            "SELECT id, id, task, completed FROM todos ORDER BY id DESC LIMIT ?"
+        )
+    )
+    before = db_rows.value(statement)
+    client.get("/todos/")
+    assert db_rows.value(statement) == before + 2
+
+
+def test_server_timing_header(client):
+    """Test that responses break down where their time went."""
+    response = client.get("/todos/")
+    phases = {
+        part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")
+    }
+    assert {"pool_wait", "db", "map", "encode", "total"} <= phases
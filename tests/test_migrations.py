@@ -0,0 +1,204 @@
+"""Tests for schema migrations and the query plans they enable."""
+
+import sqlite3
+
+import pytest
+
+from app.migrations import LATEST_VERSION, MIGRATIONS, get_schema_version, migrate
+
+POSTS_QUERY = """
+    SELECT p.id, p.title, p.body, p.createdAt, u.id, u.name, u.email, u.userId
+    FROM posts p
+    JOIN users u ON p.userId = u.userId
+    ORDER BY p.createdAt DESC
+"""
+
+USER_POSTS_QUERY = """
+    SELECT p.id, p.title, p.body, p.createdAt, u.id, u.name, u.email, u.userId
+    FROM posts p
+    JOIN users u ON p.userId = u.userId
+    WHERE p.userId = ?
+    ORDER BY p.createdAt DESC
+"""
+
+
+KEYSET_QUERY = """
+    SELECT p.id, p.title, p.body, p.createdAt, u.id, u.name, u.email, u.userId
+    FROM posts p
+    JOIN users u ON p.userId = u.userId
+    WHERE (p.createdAt, p.id) < (?, ?)
+    ORDER BY p.createdAt DESC, p.id DESC
+    LIMIT ?
+"""
+
+USER_KEYSET_QUERY = """
+    SELECT p.id, p.title, p.body, p.createdAt, u.id, u.name, u.email, u.userId
+    FROM posts p
+    JOIN users u ON p.userId = u.userId
+    WHERE p.userId = ? AND (p.createdAt, p.id) < (?, ?)
+    ORDER BY p.createdAt DESC, p.id DESC
+    LIMIT ?
+"""
+
+
+@pytest.fixture
+def conn():
+    """Create an empty in-memory database."""
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, query, params=()):
+    """Get the EXPLAIN QUERY PLAN details for a query."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def test_versions_are_sequential():
+    """Test that migrations are numbered 1..N without gaps."""
+    assert [m.version for m in MIGRATIONS] == list(range(1, LATEST_VERSION + 1))
+
+
+def test_migrate_fresh_database(conn):
+    """Test that a fresh database is brought to the latest version."""
+    assert get_schema_version(conn) == 0
+    assert migrate(conn) == LATEST_VERSION
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    assert {"users", "posts", "todos"} <= tables
+
+
+def test_migrate_is_idempotent(conn):
+    """Test that running migrations twice changes nothing."""
+    migrate(conn)
+    schema = conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall()
+    assert migrate(conn) == LATEST_VERSION
+    assert (
+        conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall() == schema
+    )
+
+
+def test_migrate_upgrades_unversioned_database(conn):
+    """Test that databases created before migrations keep their data."""
+    for statement in MIGRATIONS[0].statements:
+        conn.execute(statement)
+    conn.execute("INSERT INTO todos (task) VALUES ('legacy')")
+    conn.commit()
+
+    assert migrate(conn) == LATEST_VERSION
+    assert conn.execute("SELECT task FROM todos").fetchall() == [("legacy",)]
+
+
+def test_v1_plans_scan_and_sort(conn):
+    """Test that without indexes post listings scan and sort."""
+    migrate(conn, target=1)
+    assert any("TEMP B-TREE" in step for step in query_plan(conn, POSTS_QUERY))
+    assert any(
+        "TEMP B-TREE" in step for step in query_plan(conn, USER_POSTS_QUERY, ("u",))
+    )
+
+
+def test_v2_posts_listing_uses_created_index(conn):
+    """Test that the newest-first listing reads idx_posts_created in order."""
+    migrate(conn, target=2)
+    plan = query_plan(conn, POSTS_QUERY)
+    assert any("idx_posts_created" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_v2_user_posts_uses_composite_index(conn):
+    """Test that per-user listings seek idx_posts_user_created."""
+    migrate(conn, target=2)
+    plan = query_plan(conn, USER_POSTS_QUERY, ("u",))
+    assert any("idx_posts_user_created (userId=?)" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_v3_keyset_page_seeks_created_index(conn):
+    """Test that a posts page seeks idx_posts_created_id without sorting."""
+    migrate(conn, target=3)
+    plan = query_plan(conn, KEYSET_QUERY, ("2024-01-01 00:00:00", 10, 20))
+    assert any("idx_posts_created_id (createdAt<?)" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_v3_user_keyset_page_seeks_composite_index(conn):
+    """Test that a user's posts page seeks idx_posts_user_created_id."""
+    migrate(conn, target=3)
+    plan = query_plan(conn, USER_KEYSET_QUERY, ("u", "2024-01-01 00:00:00", 10, 20))
+    assert any(
+        "idx_posts_user_created_id (userId=? AND createdAt<?)" in step for step in plan
+    )
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_v5_backfills_updated_at_and_counts_changes(conn):
+    """Test that v5 backfills updatedAt and triggers bump table versions."""
+    migrate(conn, target=4)
+    conn.execute("INSERT INTO todos (task) VALUES ('old')")
+    conn.commit()
+    migrate(conn, target=5)
+    assert conn.execute("SELECT updatedAt FROM todos").fetchone()[0] is not None
+
+    def version(name):
+        return conn.execute(
+            "SELECT version FROM table_versions WHERE name = ?", (name,)
+        ).fetchone()[0]
+
+    conn.execute("INSERT INTO todos (task) VALUES ('new')")
+    conn.execute("UPDATE todos SET completed = TRUE")
+    conn.execute("DELETE FROM todos WHERE task = 'old'")
+    # Row-level triggers: the insert, two updated rows and the delete
+    assert version("todos") == 4
+    assert version("posts") == 0
+
+
+def test_v6_indexes_existing_posts_for_search(conn):
+    """Test that v6 indexes existing posts and the triggers follow changes."""
+    migrate(conn, target=5)
+    conn.execute(
+        "INSERT INTO posts (title, body, userId) VALUES ('Old', 'walnut', 'u')"
+    )
+    conn.commit()
+    migrate(conn, target=6)
+
+    def matches(term):
+        return conn.execute(
+            "SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?", (term,)
+        ).fetchall()
+
+    assert len(matches("walnut")) == 1
+    conn.execute("UPDATE posts SET body = 'pecan'")
+    assert matches("walnut") == []
+    assert len(matches("pecan")) == 1
+
+
+def test_v7_completed_filter_seeks_index(conn):
+    """Test that a filtered todos page seeks idx_todos_completed_id."""
+    migrate(conn, target=7)
+    plan = query_plan(
+        conn,
+        "SELECT id, task FROM todos WHERE completed = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (1, 100, 10),
+    )
+    assert any("idx_todos_completed_id (completed=? AND id<?)" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+
+def test_v8_backfills_and_maintains_counters(conn):
+    """Test that v8 seeds the counters from existing rows and keeps them current."""
+    migrate(conn, target=7)
+    conn.execute("INSERT INTO todos (task, completed) VALUES ('a', TRUE), ('b', FALSE)")
+    conn.execute("INSERT INTO users (name, email, userId) VALUES ('n', 'e', 'u')")
+    conn.execute("INSERT INTO posts (title, body, userId) VALUES ('t', 'b', 'u')")
+    conn.commit()
+    migrate(conn, target=8)
+    assert conn.execute("SELECT total, completed FROM todo_counts").fetchone() == (2, 1)
+    assert conn.execute("SELECT posts FROM user_post_counts").fetchone() == (1,)
+
+    conn.execute("UPDATE todos SET completed = TRUE")
+    conn.execute("INSERT INTO posts (title, body, userId) VALUES ('t2', 'b', 'u')")
+    assert conn.execute("SELECT total, completed FROM todo_counts").fetchone() == (2, 2)
+    assert conn.execute("SELECT posts FROM user_post_counts").fetchone() == (2,)
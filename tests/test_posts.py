@@ -0,0 +1,235 @@
+"""Tests for the posts endpoints."""
+
+import json
+
+import pytest
+
+from app.database import get_db
+from app.pagination import encode_cursor
+
+
+@pytest.fixture(autouse=True)
+def cleanup_posts():
+    """Clean up posts and users after each test."""
+    yield
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM posts")
+        cursor.execute("DELETE FROM users")
+        db.commit()
+
+
+@pytest.fixture
+def user(client):
+    """Create a user to author posts."""
+    response = client.post(
+        "/users/", json={"name": "Post Author", "email": "author@example.com"}
+    )
+    return response.json()
+
+
+def test_create_post(client, user):
+    """Test creating a post embeds its author."""
+    response = client.post(
+        "/posts/", json={"title": "Hello", "body": "World", "userId": user["userId"]}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["title"] == "Hello"
+    assert data["author"] == user
+
+
+def test_create_post_unknown_user(client):
+    """Test creating a post for a missing user."""
+    response = client.post(
+        "/posts/", json={"title": "Hello", "body": "World", "userId": "nobody"}
+    )
+    assert response.status_code == 404
+
+
+def test_paginate_posts(client, user):
+    """Test walking every page of posts with the next cursor."""
+    for i in range(5):
+        client.post(
+            "/posts/",
+            json={"title": f"Post {i}", "body": "Body", "userId": user["userId"]},
+        )
+
+    titles = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/posts/", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        titles.extend(post["title"] for post in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["after"] = cursor
+
+    # Posts created within the same second are ordered by id
+    assert titles == [f"Post {i}" for i in reversed(range(5))]
+
+
+def test_cursor_header_exposed_to_browsers(client, user):
+    """Test that cross-origin clients can read the next cursor and ETag."""
+    for i in range(2):
+        client.post(
+            "/posts/",
+            json={"title": f"Post {i}", "body": "Body", "userId": user["userId"]},
+        )
+    response = client.get(
+        "/posts/", params={"limit": 1}, headers={"Origin": "http://example.com"}
+    )
+    assert response.headers["X-Next-Cursor"]
+    exposed = response.headers["Access-Control-Expose-Headers"].lower().split(", ")
+    assert "x-next-cursor" in exposed
+    assert "etag" in exposed
+
+
+def test_paginate_user_posts(client, user):
+    """Test that user post listings are paginated too."""
+    for i in range(3):
+        client.post(
+            "/posts/",
+            json={"title": f"Post {i}", "body": "Body", "userId": user["userId"]},
+        )
+
+    first = client.get(f"/posts/user/{user['userId']}", params={"limit": 2})
+    assert [post["title"] for post in first.json()] == ["Post 2", "Post 1"]
+
+    second = client.get(
+        f"/posts/user/{user['userId']}",
+        params={"limit": 2, "after": first.headers["X-Next-Cursor"]},
+    )
+    assert [post["title"] for post in second.json()] == ["Post 0"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_invalid_cursor(client):
+    """Test that a tampered cursor is rejected."""
+    response = client.get("/posts/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_limit_is_bounded(client):
+    """Test that page sizes above the maximum are rejected."""
+    response = client.get("/posts/", params={"limit": 100000})
+    assert response.status_code == 422
+
+
+def test_export_posts_ndjson(client, user):
+    """Test that the export streams the same objects as the listing."""
+    for i in range(3):
+        client.post(
+            "/posts/",
+            json={"title": f"Post {i}", "body": "Body", "userId": user["userId"]},
+        )
+
+    response = client.get("/posts/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == client.get("/posts/").json()
+
+
+def test_update_post(client, user):
+    """Test that an updated post keeps its author."""
+    post = client.post(
+        "/posts/", json={"title": "Draft", "body": "Body", "userId": user["userId"]}
+    ).json()
+
+    response = client.put(f"/posts/{post['id']}", json={"title": "Final"})
+    assert response.status_code == 200
+    assert response.json() == {**post, "title": "Final"}
+    assert client.get(f"/posts/{post['id']}").json() == response.json()
+
+
+def test_filter_posts_by_user_and_created_range(client, user):
+    """Test userId and createdAt range filters on the posts listing."""
+    other = client.post(
+        "/users/", json={"name": "Other", "email": "other@example.com"}
+    ).json()
+    for day, author in [(1, user), (2, user), (3, other), (4, user)]:
+        post = client.post(
+            "/posts/",
+            json={"title": f"Day {day}", "body": "B", "userId": author["userId"]},
+        ).json()
+        with get_db() as db:
+            db.execute(
+                "UPDATE posts SET createdAt = ? WHERE id = ?",
+                (f"2024-01-0{day} 12:00:00", post["id"]),
+            )
+            db.commit()
+
+    response = client.get(
+        "/posts/",
+        params={
+            "userId": user["userId"],
+            "createdSince": "2024-01-02T12:00:00",
+            "createdBefore": "2024-01-05T00:00:00Z",
+        },
+    )
+    assert [post["title"] for post in response.json()] == ["Day 4", "Day 2"]
+
+    response = client.get(
+        f"/posts/user/{other['userId']}",
+        params={"createdBefore": "2024-01-03T12:00:00"},
+    )
+    assert response.json() == []
+
+
+def test_post_fields_selector(client, user):
+    """Test that fields= drops unrequested columns, including the author."""
+    client.post(
+        "/posts/",
+        json={"title": "Short", "body": "Long body", "userId": user["userId"]},
+    )
+    data = client.get("/posts/", params={"fields": "id,title"}).json()
+    assert set(data[0]) == {"id", "title"}
+
+    data = client.get(
+        f"/posts/user/{user['userId']}", params={"fields": "author"}
+    ).json()
+    assert data == [{"author": user}]
+
+
+def test_include_authors_normalizes_listing(client, user):
+    """Test that include=authors lists each author once beside the posts."""
+    other = client.post(
+        "/users/", json={"name": "Other", "email": "other@example.com"}
+    ).json()
+    for author in [user, user, other, user]:
+        client.post(
+            "/posts/", json={"title": "T", "body": "B", "userId": author["userId"]}
+        )
+
+    data = client.get("/posts/", params={"include": "authors"}).json()
+    assert len(data["posts"]) == 4
+    assert all("author" not in post for post in data["posts"])
+    assert {post["userId"] for post in data["posts"]} == set(data["authors"])
+    assert data["authors"] == {user["userId"]: user, other["userId"]: other}
+
+    data = client.get(
+        f"/posts/user/{user['userId']}",
+        params={"include": "authors", "fields": "id", "limit": 2},
+    ).json()
+    assert [set(post) for post in data["posts"]] == [{"id", "userId"}] * 2
+    assert data["authors"] == {user["userId"]: user}
+
+
+def test_include_rejects_unknown_value(client):
+    """Test that only include=authors is accepted."""
+    assert client.get("/posts/", params={"include": "comments"}).status_code == 422
+
+
+@pytest.mark.parametrize("by_user", [False, True], ids=["posts", "user_posts"])
+@pytest.mark.parametrize(
+    "key", [[{}, 1], ["2024-01-01 00:00:00", "x"], [1, 2], [None, None]]
+)
+def test_cursor_of_wrong_types_rejected(client, user, by_user, key):
+    """Test that a well-formed cursor with wrong key types is a 400."""
+    path = f"/posts/user/{user['userId']}" if by_user else "/posts/"
+    response = client.get(path, params={"after": encode_cursor(key)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
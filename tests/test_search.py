@@ -0,0 +1,120 @@
+"""Tests for full-text search over posts."""
+
+import pytest
+
+from app.database import get_db
+from app.pagination import encode_cursor
+from app.search import match_expression, rebuild_search_index
+
+
+@pytest.fixture(autouse=True)
+def cleanup_posts():
+    """Clean up posts and users after each test."""
+    yield
+    with get_db() as db:
+        db.execute("DELETE FROM posts")
+        db.execute("DELETE FROM users")
+        db.commit()
+
+
+@pytest.fixture
+def user(client):
+    """Create a user to author posts."""
+    response = client.post(
+        "/users/", json={"name": "Searcher", "email": "search@example.com"}
+    )
+    return response.json()
+
+
+def create_post(client, user, title, body):
+    """Create a post and return its id."""
+    response = client.post(
+        "/posts/", json={"title": title, "body": body, "userId": user["userId"]}
+    )
+    return response.json()["id"]
+
+
+def test_match_expression_quotes_operators():
+    """Test that user input cannot inject FTS5 syntax."""
+    assert match_expression('apple OR "pie') == '"apple" "OR" """pie"'
+    assert match_expression("app*") == '"app"*'
+    assert match_expression("  * ") is None
+
+
+def test_search_ranks_title_matches_first(client, user):
+    """Test BM25 ranking with title matches weighted above body matches."""
+    body_hit = create_post(client, user, "Fruit", "I ate an apple today")
+    title_hit = create_post(client, user, "Apple pie", "A recipe")
+    create_post(client, user, "Other", "Nothing to see")
+
+    response = client.get("/posts/search", params={"q": "apple"})
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == [title_hit, body_hit]
+    assert response.json()[0]["author"]["userId"] == user["userId"]
+
+
+def test_search_snippet_is_escaped_and_highlighted(client, user):
+    """Test that snippets mark matches and escape the post's HTML."""
+    create_post(client, user, "Markup", "<b>bold</b> banana split")
+    snippet = client.get("/posts/search", params={"q": "banana"}).json()[0]["snippet"]
+    assert "&lt;b&gt;bold&lt;/b&gt;" in snippet
+    assert "<mark>banana</mark>" in snippet
+
+
+def test_search_paginates_with_cursor(client, user):
+    """Test walking every page of search results."""
+    ids = {create_post(client, user, f"Note {i}", "kiwi " * (i + 1)) for i in range(5)}
+    create_post(client, user, "Unrelated", "mango")
+
+    seen, after = [], None
+    while True:
+        params = {"q": "kiwi", "limit": 2, **({"after": after} if after else {})}
+        response = client.get("/posts/search", params=params)
+        seen += [post["id"] for post in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    assert len(seen) == 5
+    assert set(seen) == ids
+
+
+def test_search_follows_updates_and_deletes(client, user):
+    """Test that triggers keep the index in step with the posts table."""
+    post_id = create_post(client, user, "Draft", "cherry")
+    client.put(f"/posts/{post_id}", json={"body": "plum"})
+    assert client.get("/posts/search", params={"q": "cherry"}).json() == []
+    assert len(client.get("/posts/search", params={"q": "plum"}).json()) == 1
+
+    client.delete(f"/posts/{post_id}")
+    assert client.get("/posts/search", params={"q": "plum"}).json() == []
+
+
+def test_search_requires_query(client):
+    """Test that an empty query is rejected."""
+    assert client.get("/posts/search").status_code == 422
+    assert client.get("/posts/search", params={"q": ""}).status_code == 422
+
+
+def test_rebuild_repairs_index(client, user):
+    """Test that an online rebuild restores a drifted index."""
+    ids = [create_post(client, user, f"Post {i}", "grape") for i in range(5)]
+    with get_db() as db:
+        db.execute("DELETE FROM posts_fts")
+        db.execute(
+            "INSERT INTO posts_fts (rowid, title, body) VALUES (99999, 'ghost', 'grape')"
+        )
+        db.commit()
+        assert rebuild_search_index(db, batch_size=2) == 5
+
+    found = client.get("/posts/search", params={"q": "grape"}).json()
+    assert sorted(post["id"] for post in found) == ids
+
+
+@pytest.mark.parametrize("key", [[{}, 1], ["x", 1], [-1.5, "1"], [-1.5]])
+def test_search_cursor_of_wrong_types_rejected(client, key):
+    """Test that a well-formed cursor with wrong key types is a 400."""
+    response = client.get(
+        "/posts/search", params={"q": "anything", "after": encode_cursor(key)}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,61 @@
+"""Tests for the fast response serialization path."""
+
+import json
+
+from app.models.post import PostResponse
+from app.models.todo import Todo
+from app.models.user import User
+from app.serialization import (
+    json_response,
+    post_row_to_dict,
+    todo_row_to_dict,
+    user_row_to_dict,
+)
+
+POST_ROW = (
+    7,
+    "Title",
+    "Body",
+    "2024-03-26 12:00:00",
+    3,
+    "Firstname Lastname",
+    "name@domain.com",
+    "123e4567-e89b-12d3-a456-426614174000",
+)
+
+
+def test_post_row_matches_model_output():
+    """Test that a mapped post row encodes exactly like PostResponse."""
+    model = PostResponse(
+        id=POST_ROW[0],
+        title=POST_ROW[1],
+        body=POST_ROW[2],
+        createdAt=POST_ROW[3],
+        author=User(
+            id=POST_ROW[4], name=POST_ROW[5], email=POST_ROW[6], userId=POST_ROW[7]
+        ),
+    )
+    assert post_row_to_dict(POST_ROW) == model.model_dump(mode="json")
+
+
+def test_user_row_matches_model_output():
+    """Test that a mapped user row encodes exactly like User."""
+    row = POST_ROW[4:]
+    model = User(id=row[0], name=row[1], email=row[2], userId=row[3])
+    assert user_row_to_dict(row) == model.model_dump(mode="json")
+
+
+def test_todo_row_matches_model_output():
+    """Test that SQLite's integer booleans come out as JSON booleans."""
+    row = (1, "Buy groceries", 1)
+    model = Todo(id=row[0], task=row[1], completed=row[2])
+    assert todo_row_to_dict(row) == model.model_dump(mode="json")
+
+
+def test_json_response():
+    """Test that payloads are encoded once with the given status and headers."""
+    response = json_response([{"id": 1}], status_code=201, headers={"X-Test": "1"})
+    assert response.status_code == 201
+    assert response.headers["X-Test"] == "1"
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"id": 1}]
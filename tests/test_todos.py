@@ -1,7 +1,13 @@
 """Tests for the todos endpoints."""
 
+import json
+import threading
+
 import pytest
-from app.database import get_db
+import app.database
+from app.database import acquire_export_slot, get_db, get_pool
+from app.pagination import encode_cursor
+
 
 @pytest.fixture(autouse=True)
 def cleanup_todos():
@@ -141,3 +147,199 @@ def test_batch_update_nonexistent_todo(client):
     response = client.put("/todos/batch", json=updates)
     assert response.status_code == 404
     assert "Todo with id 999 not found" in response.json()["detail"]
+
+
+def test_paginate_todos(client):
+    """Test walking todos page by page, newest first."""
+    ids = [
+        client.post("/todos/", json={"task": f"Todo {i}"}).json()["id"]
+        for i in range(3)
+    ]
+
+    first = client.get("/todos/", params={"limit": 2})
+    assert [todo["id"] for todo in first.json()] == ids[:0:-1]
+
+    second = client.get(
+        "/todos/", params={"limit": 2, "after": first.headers["X-Next-Cursor"]}
+    )
+    assert [todo["id"] for todo in second.json()] == ids[:1]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_export_todos_ndjson(client):
+    """Test that the todo export streams one JSON object per line."""
+    client.post("/todos/", json={"task": "Todo 1", "completed": True})
+    client.post("/todos/", json={"task": "Todo 2"})
+
+    response = client.get("/todos/export")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == client.get("/todos/").json()
+    assert lines[1]["completed"] is True
+
+
+def test_export_does_not_use_pooled_connections(client):
+    """Test that exports run while every pooled connection is busy."""
+    client.post("/todos/", json={"task": "Exported"})
+    pool = get_pool()
+    held = []
+    try:
+        while pool.size < pool.max_size or pool.idle:
+            held.append(pool.acquire())
+        response = client.get("/todos/export")
+    finally:
+        for conn in held:
+            pool.release(conn)
+    assert response.status_code == 200
+    assert [json.loads(line)["task"] for line in response.text.splitlines()] == [
+        "Exported"
+    ]
+
+
+def test_export_limit_returns_503(client, monkeypatch):
+    """Test that exports beyond the concurrency cap are shed."""
+    monkeypatch.setattr(app.database, "_export_slots", threading.BoundedSemaphore(1))
+    release = acquire_export_slot()
+    try:
+        response = client.get("/todos/export")
+    finally:
+        release()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/todos/export").status_code == 200
+
+
+def test_create_todos_batch(client):
+    """Test creating several todos in one request."""
+    payload = {
+        "todos": [
+            {"task": "Batch 1"},
+            {"task": "Batch 2", "completed": True},
+            {"task": "Batch 3"},
+        ]
+    }
+    response = client.post("/todos/batch", json=payload)
+    assert response.status_code == 201
+    created = response.json()
+    assert [todo["task"] for todo in created] == ["Batch 1", "Batch 2", "Batch 3"]
+    assert [todo["completed"] for todo in created] == [False, True, False]
+    assert created[0]["id"] < created[1]["id"] < created[2]["id"]
+    assert client.get(f"/todos/{created[1]['id']}").json() == created[1]
+
+
+def test_create_todos_batch_in_chunks(client, monkeypatch):
+    """Test that batches larger than a chunk are inserted in order."""
+    monkeypatch.setattr("app.routers.todos.TODO_BATCH_CHUNK_SIZE", 2)
+    payload = {"todos": [{"task": f"Chunked {i}"} for i in range(5)]}
+    response = client.post("/todos/batch", json=payload)
+    assert response.status_code == 201
+    assert [todo["task"] for todo in response.json()] == [
+        f"Chunked {i}" for i in range(5)
+    ]
+
+
+def test_create_todos_batch_too_large(client, monkeypatch):
+    """Test that oversized batches are rejected before touching the database."""
+    monkeypatch.setattr("app.routers.todos.TODO_BATCH_MAX_SIZE", 2)
+    payload = {"todos": [{"task": f"Todo {i}"} for i in range(3)]}
+    response = client.post("/todos/batch", json=payload)
+    assert response.status_code == 413
+    assert client.get("/todos/").json() == []
+
+
+def test_batch_update_is_all_or_nothing(client):
+    """Test that a missing todo leaves the others untouched."""
+    todo = client.post("/todos/", json={"task": "Keep me"}).json()
+
+    updates = [
+        {"id": todo["id"], "task": "Changed"},
+        {"id": 999, "task": "Missing"},
+    ]
+    assert client.put("/todos/batch", json=updates).status_code == 404
+    assert client.get(f"/todos/{todo['id']}").json()["task"] == "Keep me"
+
+
+def test_batch_update_merges_repeated_ids(client):
+    """Test that repeated ids apply in order and report the final row."""
+    todo = client.post("/todos/", json={"task": "Original"}).json()
+
+    updates = [
+        {"id": todo["id"], "task": "First"},
+        {"id": todo["id"], "completed": True},
+        {"id": todo["id"]},
+    ]
+    response = client.put("/todos/batch", json=updates)
+    assert response.status_code == 200
+    final = {"id": todo["id"], "task": "First", "completed": True}
+    assert response.json() == [final, final, final]
+
+
+def test_batch_update_in_chunks(client, monkeypatch):
+    """Test that batches spanning several chunks are fully applied."""
+    monkeypatch.setattr("app.routers.todos.TODO_BATCH_CHUNK_SIZE", 2)
+    todos = client.post(
+        "/todos/batch", json={"todos": [{"task": f"Todo {i}"} for i in range(5)]}
+    ).json()
+
+    updates = [{"id": todo["id"], "completed": True} for todo in todos]
+    response = client.put("/todos/batch", json=updates)
+    assert response.status_code == 200
+    assert [todo["completed"] for todo in response.json()] == [True] * 5
+    assert [todo["task"] for todo in response.json()] == [f"Todo {i}" for i in range(5)]
+
+
+def test_filter_todos_by_completion(client):
+    """Test that completed= filters in SQL and still paginates."""
+    for i in range(6):
+        client.post("/todos/", json={"task": f"Todo {i}", "completed": i % 2 == 0})
+
+    response = client.get("/todos/", params={"completed": True, "limit": 2})
+    page = response.json()
+    assert [todo["task"] for todo in page] == ["Todo 4", "Todo 2"]
+    response = client.get(
+        "/todos/",
+        params={"completed": True, "after": response.headers["X-Next-Cursor"]},
+    )
+    assert [todo["task"] for todo in response.json()] == ["Todo 0"]
+    assert all(
+        not todo["completed"]
+        for todo in client.get("/todos/", params={"completed": False}).json()
+    )
+
+
+def test_todo_fields_selector(client):
+    """Test that fields= limits the returned keys."""
+    client.post("/todos/", json={"task": "Sparse", "completed": True})
+    response = client.get("/todos/", params={"fields": "task,id"})
+    assert response.json() == [{"id": response.json()[0]["id"], "task": "Sparse"}]
+
+    response = client.get("/todos/", params={"fields": "task,nope"})
+    assert response.status_code == 400
+    assert client.get("/todos/", params={"fields": ","}).status_code == 400
+
+
+def test_todo_stats_follow_writes(client):
+    """Test that the maintained counters track inserts, updates and deletes."""
+    assert client.get("/todos/stats").json() == {"total": 0, "completed": 0, "open": 0}
+    ids = [
+        client.post("/todos/", json={"task": f"T{i}", "completed": i == 0}).json()["id"]
+        for i in range(3)
+    ]
+    client.post("/todos/batch", json={"todos": [{"task": "B", "completed": True}]})
+    client.put(f"/todos/{ids[1]}", json={"completed": True})
+    client.put(f"/todos/{ids[1]}", json={"completed": True})
+    client.delete(f"/todos/{ids[0]}")
+
+    assert client.get("/todos/stats").json() == {"total": 3, "completed": 2, "open": 1}
+    etag = client.get("/todos/stats").headers["ETag"]
+    assert (
+        client.get("/todos/stats", headers={"If-None-Match": etag}).status_code == 304
+    )
+
+
+@pytest.mark.parametrize("key", [[{}], ["x"], [True], [1.5], [[1]]])
+def test_cursor_of_wrong_types_rejected(client, key):
+    """Test that a well-formed cursor with wrong key types is a 400."""
+    response = client.get("/todos/", params={"after": encode_cursor(key)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,100 @@
+"""Tests for the users endpoints."""
+
+import pytest
+
+from app.database import get_db
+from app.pagination import encode_cursor
+
+
+@pytest.fixture(autouse=True)
+def cleanup_users():
+    """Clean up users and their posts after each test."""
+    yield
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM posts")
+        cursor.execute("DELETE FROM users")
+        db.commit()
+
+
+def create_user(client, name="Test User", email="user@example.com"):
+    """Create a user and return the response payload."""
+    return client.post("/users/", json={"name": name, "email": email}).json()
+
+
+def test_create_user(client):
+    """Test creating a user assigns ids."""
+    response = client.post(
+        "/users/", json={"name": "Test User", "email": "user@example.com"}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["name"] == "Test User"
+    assert data["email"] == "user@example.com"
+    assert data["userId"]
+    assert client.get(f"/users/{data['userId']}").json() == data
+
+
+def test_create_user_duplicate_email(client):
+    """Test that emails must be unique."""
+    create_user(client)
+    response = client.post(
+        "/users/", json={"name": "Other", "email": "user@example.com"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+
+
+def test_update_user(client):
+    """Test that updates return the stored row."""
+    user = create_user(client)
+    response = client.put(f"/users/{user['userId']}", json={"name": "Renamed"})
+    assert response.status_code == 200
+    assert response.json() == {**user, "name": "Renamed"}
+
+
+def test_update_user_email_taken(client):
+    """Test that changing to another user's email is rejected."""
+    create_user(client, email="taken@example.com")
+    user = create_user(client)
+    response = client.put(
+        f"/users/{user['userId']}", json={"email": "taken@example.com"}
+    )
+    assert response.status_code == 400
+    assert client.get(f"/users/{user['userId']}").json() == user
+
+
+def test_update_missing_user(client):
+    """Test that updating an unknown user is a 404, with or without fields."""
+    assert client.put("/users/nobody", json={"name": "X"}).status_code == 404
+    assert client.put("/users/nobody", json={}).status_code == 404
+
+
+def test_user_stats_count_posts(client):
+    """Test that a user's post count follows creates and deletes."""
+    user = create_user(client)
+    assert client.get(f"/users/{user['userId']}/stats").json() == {
+        "userId": user["userId"],
+        "posts": 0,
+    }
+    posts = [
+        client.post(
+            "/posts/", json={"title": "T", "body": "B", "userId": user["userId"]}
+        ).json()
+        for _ in range(3)
+    ]
+    client.delete(f"/posts/{posts[0]['id']}")
+    assert client.get(f"/users/{user['userId']}/stats").json()["posts"] == 2
+
+
+def test_user_stats_unknown_user(client):
+    """Test stats for a missing user."""
+    assert client.get("/users/nobody/stats").status_code == 404
+
+
+@pytest.mark.parametrize("key", [[{}], ["x"], [None]])
+def test_cursor_of_wrong_types_rejected(client, key):
+    """Test that a well-formed cursor with wrong key types is a 400."""
+    response = client.get("/users/", params={"after": encode_cursor(key)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,171 @@
+"""Tests for the write path and the group-commit writer."""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+from fastapi import HTTPException, status
+
+import app.writer
+from app.database import get_db
+from app.writer import GroupCommitWriter, WriteTimeout, close_writer, run_write
+
+
+@pytest.fixture
+def writer(tmp_path):
+    """Create a writer over a scratch table."""
+    path = tmp_path / "writer.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+    conn.close()
+    writer = GroupCommitWriter(path, {}, max_batch=8, interval=0.05)
+    yield writer
+    writer.close()
+
+
+def insert(conn, value):
+    """Insert one row and return its id."""
+    return conn.execute(
+        "INSERT INTO t (v) VALUES (?) RETURNING id", (value,)
+    ).fetchone()[0]
+
+
+def count_rows(writer):
+    """Count committed rows through a separate connection."""
+    conn = sqlite3.connect(writer.db_path)
+    try:
+        return conn.execute("SELECT count(*) FROM t").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_concurrent_writes_share_a_commit(writer):
+    """Test that writes arriving together are committed as one batch."""
+    seen = []
+
+    def traced_insert(conn, value):
+        seen.append(conn.in_transaction)
+        return insert(conn, value)
+
+    futures = [writer.submit(traced_insert, f"v{i}") for i in range(8)]
+    ids = [future.result(timeout=5) for future in futures]
+    assert sorted(ids) == list(range(1, 9))
+    assert all(seen)
+    assert count_rows(writer) == 8
+
+
+def test_results_resolve_after_commit(writer):
+    """Test that a resolved write is visible to other connections."""
+    writer.submit(insert, "durable").result(timeout=5)
+    assert count_rows(writer) == 1
+
+
+def test_failed_write_only_rolls_back_itself(writer):
+    """Test that a failing write does not undo the rest of its batch."""
+
+    def insert_then_fail(conn, value):
+        insert(conn, value)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    ok = writer.submit(insert, "a")
+    failed = writer.submit(insert_then_fail, "b")
+    duplicate = writer.submit(insert, "a")
+    also_ok = writer.submit(insert, "c")
+
+    assert ok.result(timeout=5)
+    assert also_ok.result(timeout=5)
+    with pytest.raises(HTTPException):
+        failed.result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(timeout=5)
+    assert count_rows(writer) == 2
+
+
+def test_close_flushes_queued_writes(writer):
+    """Test that closing the writer finishes what was queued."""
+    futures = [writer.submit(insert, f"v{i}") for i in range(20)]
+    writer.close()
+    assert all(future.done() for future in futures)
+    assert count_rows(writer) == 20
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, "late")
+
+
+def test_writer_that_cannot_connect_fails_writes(tmp_path):
+    """Test that writes fail instead of hanging when the writer cannot start."""
+    started = threading.Event()
+
+    class BrokenWriter(GroupCommitWriter):
+        def _connect(self):
+            started.wait(5)
+            raise sqlite3.OperationalError("unable to open database file")
+
+    writer = BrokenWriter(tmp_path / "missing" / "writer.db", {})
+    queued = writer.submit(insert, "queued")
+    started.set()
+    with pytest.raises(sqlite3.OperationalError):
+        queued.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, "late")
+    writer.close()
+
+
+def test_write_that_cannot_start_times_out(writer, monkeypatch):
+    """Test that a write stuck behind a long one is dropped after the timeout."""
+    monkeypatch.setattr(app.writer, "DB_WRITE_TIMEOUT", 0.2)
+    monkeypatch.setattr(app.writer, "get_writer", lambda: writer)
+    monkeypatch.setattr(app.writer, "DB_WRITE_MODE", "group")
+    release = threading.Event()
+
+    def slow_insert(conn, value):
+        release.wait(5)
+        return insert(conn, value)
+
+    async def scenario():
+        slow = asyncio.create_task(run_write(slow_insert, "slow"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(WriteTimeout):
+            await run_write(insert, "stuck")
+        release.set()
+        # A write that had already started is waited for past the timeout
+        return await slow
+
+    assert asyncio.run(scenario()) == 1
+    assert count_rows(writer) == 1
+
+
+@pytest.fixture
+def group_mode(monkeypatch):
+    """Route API writes through the group-commit writer."""
+    monkeypatch.setattr(app.writer, "DB_WRITE_MODE", "group")
+    yield
+    close_writer()
+    with get_db() as db:
+        db.execute("DELETE FROM todos")
+        db.execute("DELETE FROM users")
+        db.commit()
+
+
+def test_api_writes_in_group_mode(client, group_mode):
+    """Test that the routers work unchanged on top of the writer."""
+    results = []
+
+    def create(i):
+        results.append(client.post("/todos/", json={"task": f"Group {i}"}))
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [response.status_code for response in results] == [201] * 10
+
+    todo_id = results[0].json()["id"]
+    assert client.put(f"/todos/{todo_id}", json={"completed": True}).json()["completed"]
+    assert client.delete("/todos/999999").status_code == 404
+    assert client.get("/todos/stats").json()["total"] == 10
+
+    client.post("/users/", json={"name": "A", "email": "group@example.com"})
+    response = client.post("/users/", json={"name": "B", "email": "group@example.com"})
+    assert response.status_code == 400